@@ -0,0 +1,204 @@
+"""Vectorized analytics over stored observations.
+
+Stored series are loaded into one set of contiguous NumPy arrays (values and
+period ordinals, sorted by series then time, with per-series offsets), and
+every metric is computed for all series in one pass:
+
+* month-over-month (period-over-period) change and percent change
+* year-over-year percent change
+* rolling mean / standard deviation of the period-over-period change
+* surprise against the configured expectation (series.json "expectation"),
+  z-scored by its configured stdev or, failing that, the rolling stdev
+
+The latest point of each series feeds the event description and the alert
+severity.
+"""
+import logging
+import math
+import sqlite3
+
+import numpy as np
+
+import metrics
+import series_registry
+import storage
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOW = 12
+SEVERITY_THRESHOLDS = (('high', 2.0), ('medium', 1.0))  # |z| at or above -> severity
+
+# Periods per year by BLS period prefix (M01-M12, Q01-Q04, S01-S02, A01)
+_FREQUENCY = {'M': 12, 'Q': 4, 'S': 2, 'A': 1}
+
+class SeriesPanel:
+    """Observations for many series packed into contiguous, time-sorted arrays."""
+
+    def __init__(self, series_ids, offsets, ordinals, frequencies, values, years, periods):
+        self.series_ids = series_ids  # list of N series IDs
+        self.offsets = offsets  # int64[N + 1]; series i occupies [offsets[i], offsets[i + 1])
+        self.ordinals = ordinals  # int64[M]; year * frequency + period index
+        self.frequencies = frequencies  # int64[M]; periods per year of each point
+        self.values = values  # float64[M]; NaN where BLS published no number
+        self.years = years  # int64[M]
+        self.periods = periods  # list of M period codes
+
+    def __len__(self):
+        return len(self.series_ids)
+
+def _parse_value(value):
+    try:
+        return float(value.replace(',', ''))
+    except (AttributeError, ValueError):
+        return math.nan
+
+def load_panel(series_ids=None, conn=None):
+    """Loads stored observations (annual averages excluded) into a SeriesPanel."""
+    conn = conn or storage.get_connection()
+    sql = "SELECT series_id, year, period, value FROM observations WHERE period != 'M13'"
+    params = []
+    if series_ids is not None:
+        params = list(series_ids)
+        sql += f" AND series_id IN ({', '.join('?' * len(params))})"
+    sql += " ORDER BY series_id, year, period"
+    rows = conn.execute(sql, params).fetchall() if series_ids is None or params else []
+
+    count = len(rows)
+    years = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    frequencies = np.fromiter((_FREQUENCY.get(row[2][:1], 1) for row in rows), dtype=np.int64, count=count)
+    period_index = np.fromiter((int(row[2][1:]) - 1 if row[2][1:].isdigit() else 0 for row in rows),
+                               dtype=np.int64, count=count)
+    values = np.fromiter((_parse_value(row[3]) for row in rows), dtype=np.float64, count=count)
+
+    ids = []
+    starts = []
+    previous = None
+    for i, row in enumerate(rows):
+        if row[0] != previous:
+            ids.append(row[0])
+            starts.append(i)
+            previous = row[0]
+    offsets = np.array(starts + [count], dtype=np.int64)
+    return SeriesPanel(ids, offsets, years * frequencies + period_index, frequencies, values,
+                       years, [row[2] for row in rows])
+
+def _segment_ids(panel):
+    return np.repeat(np.arange(len(panel.series_ids), dtype=np.int64), np.diff(panel.offsets))
+
+def _lagged(panel, segments, lags):
+    """Value `lags` periods earlier in the same series, or NaN when that period is missing."""
+    span = int(panel.ordinals.max()) + int(np.max(lags)) + 1 if len(panel.ordinals) else 1
+    keys = segments * span + panel.ordinals
+    targets = keys - lags
+    positions = np.searchsorted(keys, targets)
+    positions = np.clip(positions, 0, len(keys) - 1)
+    found = keys[positions] == targets
+    return np.where(found, panel.values[positions], np.nan)
+
+def _rolling(values, segments, window):
+    """Rolling mean and stdev over the last `window` points of each series, ignoring NaN."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    csum = np.concatenate(([0.0], np.cumsum(filled)))
+    csq = np.concatenate(([0.0], np.cumsum(filled * filled)))
+    ccount = np.concatenate(([0], np.cumsum(valid)))
+
+    index = np.arange(len(values))
+    # Window start, clipped to the first point of the point's own series
+    segment_start = np.searchsorted(segments, segments, side='left')
+    start = np.maximum(index - window + 1, segment_start)
+    end = index + 1
+    count = ccount[end] - ccount[start]
+    total = csum[end] - csum[start]
+    squares = csq[end] - csq[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+        variance = np.where(count > 1, (squares - count * mean * mean) / (count - 1), np.nan)
+    return mean, np.sqrt(np.maximum(variance, 0.0))
+
+def compute_metrics(panel, window=ROLLING_WINDOW):
+    """Computes per-point metrics for every series in one vectorized pass."""
+    segments = _segment_ids(panel)
+    values = panel.values
+    previous = _lagged(panel, segments, np.ones_like(panel.ordinals))
+    year_ago = _lagged(panel, segments, panel.frequencies)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mom_change = values - previous
+        mom_pct = mom_change / np.abs(previous) * 100.0
+        yoy_pct = (values - year_ago) / np.abs(year_ago) * 100.0
+    rolling_mean, rolling_std = _rolling(mom_change, segments, window)
+    return {
+        'value': values,
+        'previous': previous,
+        'mom_change': mom_change,
+        'mom_pct': mom_pct,
+        'yoy_pct': yoy_pct,
+        'rolling_mean': rolling_mean,
+        'rolling_std': rolling_std,
+    }
+
+def _severity(z):
+    if z is None:
+        return 'unknown'
+    for name, threshold in SEVERITY_THRESHOLDS:
+        if abs(z) >= threshold:
+            return name
+    return 'low'
+
+def _clean(x):
+    return None if x is None or math.isnan(x) else float(x)
+
+def latest_metrics(panel, computed=None):
+    """Returns {series_id: {...}} for the newest point of each series, with surprise and severity.
+
+    `computed` is compute_metrics(panel) when the caller already has it.
+    """
+    computed = computed or compute_metrics(panel)
+    if not len(panel):
+        return {}
+    last = panel.offsets[1:] - 1
+    columns = {name: array[last] for name, array in computed.items()}
+
+    results = {}
+    for i, series_id in enumerate(panel.series_ids):
+        row = {name: _clean(column[i]) for name, column in columns.items()}
+        row['year'] = int(panel.years[last[i]])
+        row['period'] = panel.periods[last[i]]
+
+        surprise = z = None
+        expectation = series_registry.expectation(series_id)
+        if expectation and expectation.get('value') is not None:
+            measure = expectation.get('measure', 'level')
+            actual = row['value'] if measure == 'level' else row.get(measure)
+            if actual is not None:
+                surprise = actual - float(expectation['value'])
+                scale = expectation.get('stdev') or row['rolling_std']
+                z = surprise / scale if scale else None
+        elif row['mom_change'] is not None and row['rolling_std']:
+            # No expectation configured: score the move against its own recent volatility
+            z = (row['mom_change'] - (row['rolling_mean'] or 0.0)) / row['rolling_std']
+        row['surprise'] = surprise
+        row['surprise_z'] = z
+        row['severity'] = _severity(z)
+        results[series_id] = row
+    return results
+
+def analyze_series(series_ids):
+    """Loads and analyzes the given series; returns latest_metrics, or {} on database errors."""
+    try:
+        with metrics.timer('analytics.ms'):
+            return latest_metrics(load_panel(series_ids))
+    except sqlite3.Error as e:
+        logger.error("Database error while computing analytics: %s", e)
+        return {}
+
+def format_metrics(row):
+    """Short human-readable summary of one latest_metrics row, used in event descriptions."""
+    parts = []
+    if row.get('mom_change') is not None:
+        parts.append(f"MoM = {row['mom_change']:+.2f}")
+    if row.get('yoy_pct') is not None:
+        parts.append(f"YoY = {row['yoy_pct']:+.2f}%")
+    if row.get('surprise_z') is not None:
+        parts.append(f"Surprise z = {row['surprise_z']:+.2f}")
+    return ", ".join(parts)
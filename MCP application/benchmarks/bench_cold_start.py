@@ -0,0 +1,83 @@
+"""Cold-start benchmark for `collector_cli.py poll-once`, as run from cron.
+
+Every measurement starts a fresh interpreter:
+
+* import time of the CLI and of the collector module (python -X importtime),
+  next to the heavy packages that are now imported only when needed
+* wall time of a complete `poll-once` against the local fake BLS API
+  (benchmarks/fakes.py): the first run on an empty database (migrations, new
+  data, analytics, notifications) and repeated runs that find nothing new
+
+    python benchmarks/bench_cold_start.py --runs 10
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fakes import FakeBLSServer, FakeWebhookSink  # noqa: E402
+
+IMPORT_TARGETS = ('collector_cli', 'data_collector', 'requests', 'numpy', 'bs4')
+_IMPORTTIME_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)")
+
+def import_time_ms(module, runs):
+    """Median cumulative import time of `module` in a fresh interpreter, or None if unavailable."""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=APP_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        for cumulative, name in _IMPORTTIME_RE.findall(result.stderr):
+            if name == module:
+                samples.append(int(cumulative) / 1000)
+    return statistics.median(samples) if samples else None
+
+def poll_once_ms(workdir, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(APP_DIR, 'collector_cli.py'), 'poll-once'],
+                   cwd=workdir, env=env, check=True)
+    return (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print("Import time (median of fresh interpreters):")
+    for module in IMPORT_TARGETS:
+        ms = import_time_ms(module, args.runs)
+        print(f"  {module:<16} {'not installed' if ms is None else f'{ms:8.1f} ms'}")
+
+    bls = FakeBLSServer().start()
+    sink = FakeWebhookSink().start()
+    workdir = tempfile.mkdtemp(prefix='bench-cold-start-')
+    try:
+        shutil.copy(os.path.join(APP_DIR, 'series.json'), workdir)
+        with open(os.path.join(workdir, 'api_key.txt'), 'w') as f:
+            f.write('benchmark')
+        env = dict(os.environ, BLS_API_URL=bls.api_url, DISCORD_WEBHOOK_URL=sink.url,
+                   ECONOMIC_EVENTS_DB=os.path.join(workdir, 'bench.db'), LOG_LEVEL='WARNING')
+
+        first = poll_once_ms(workdir, env)
+        idle = [poll_once_ms(workdir, env) for _ in range(args.runs)]
+        print("poll-once wall time (fresh process each run):")
+        print(f"  empty database, new data:   {first:8.1f} ms ({len(sink.arrivals)} notifications)")
+        print(f"  nothing new (median of {args.runs}): {statistics.median(idle):8.1f} ms "
+              f"(min {min(idle):.1f}, max {max(idle):.1f})")
+    finally:
+        bls.stop()
+        sink.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Offline end-to-end benchmark: fake BLS release -> collector -> fake webhook.
+
+Each scenario runs in its own process against a fresh database, a local fake
+BLS v2 API / release page and a fake webhook sink (see fakes.py). After seeding
+history, it measures unchanged ("idle") polls, then scripts a release and polls
+until every series' alert has reached the sink. Reported per scenario:
+
+* release-to-notification latency percentiles (ms)
+* polls per second for idle polls, and release-page polls per second (304s)
+* database statements per idle poll and for the poll that saw the release
+* peak resident memory of the scenario process
+* per-stage timing histograms from metrics.py (HTTP, parse, DB, notify)
+
+Results are written as JSON so runs can be compared:
+
+    python benchmarks/bench_e2e.py --output results.json
+    python benchmarks/bench_e2e.py --series 4 100 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+
+API_KEY = 'benchmark'
+DEFAULT_SERIES_COUNTS = (4, 100, 1000)
+COMPARED_METRICS = (
+    'latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms', 'idle_polls_per_s',
+    'page_polls_per_s', 'db_ops_per_idle_poll', 'db_ops_per_release_poll', 'peak_rss_mb',
+)
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run_scenario(series_count, mode, idle_polls, poll_interval, release_delay, timeout):
+    """Runs one scenario in this process and returns its metrics."""
+    workdir = tempfile.mkdtemp(prefix='bench-e2e-')
+    os.environ['ECONOMIC_EVENTS_DB'] = os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+    sys.path.insert(0, BENCH_DIR)
+
+    import data_collector
+    import fetch_planner
+    import metrics
+    import notification_dispatcher
+    import notification_service
+    import series_registry
+    import storage
+    from fakes import FakeBLSServer, FakeWebhookSink
+
+    # Count every SQL statement the poll path runs (the background outbox thread is excluded)
+    db_ops = [0]
+    open_connection = storage._open_connection
+    def counting_open_connection(database_file):
+        conn = open_connection(database_file)
+        if threading.current_thread().name != 'outbox-dispatcher':
+            def count(_statement):
+                db_ops[0] += 1
+            conn.set_trace_callback(count)
+        return conn
+    storage._open_connection = counting_open_connection
+
+    series_ids = [f'BENCH{i:05d}' for i in range(series_count)]
+    series_registry._registry = {s: {'series_id': s, 'name': s} for s in series_ids}
+    fetch_planner.DAILY_QUERY_LIMIT = 10 ** 9
+
+    bls = FakeBLSServer().start()
+    sink = FakeWebhookSink().start()
+    data_collector.BLS_API_BASE_URL = bls.api_url
+    data_collector.BLS_NONFARM_URL = bls.release_page_url
+    notification_service.DISCORD_WEBHOOK_URL = sink.url
+
+    data_collector.init_database()
+    stop = threading.Event()
+    threading.Thread(target=notification_dispatcher.run_dispatcher, args=(stop, 0.05),
+                     name='outbox-dispatcher', daemon=True).start()
+
+    if mode == 'pipeline':
+        import asyncio
+        import pipeline
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        engine = pipeline.Pipeline(API_KEY)
+        asyncio.run_coroutine_threadsafe(engine.start(), loop).result()
+        year = time.localtime().tm_year
+
+        def poll():
+            return asyncio.run_coroutine_threadsafe(engine.poll(series_ids, None, year), loop).result()
+
+        def shutdown():
+            asyncio.run_coroutine_threadsafe(engine.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+    else:
+        def poll():
+            return data_collector.poll_once(API_KEY, series_ids)
+
+        def shutdown():
+            pass
+
+    # Seed history; the first poll alerts on every series, so drain those alerts
+    poll()
+    deadline = time.time() + timeout
+    while len(sink.arrivals) < series_count and time.time() < deadline:
+        time.sleep(0.05)
+    sink.reset()
+
+    # Unchanged polls: one request per chunk and nothing else
+    ops_before = db_ops[0]
+    started = time.perf_counter()
+    for _ in range(idle_polls):
+        poll()
+    idle_seconds = time.perf_counter() - started
+    db_ops_per_idle_poll = (db_ops[0] - ops_before) / idle_polls
+
+    data_collector.fetch_nonfarm_data_via_requests()
+    started = time.perf_counter()
+    for _ in range(idle_polls):
+        data_collector.fetch_nonfarm_data_via_requests()
+    page_seconds = time.perf_counter() - started
+
+    # Scripted release; poll at a fixed interval until every alert has arrived
+    bls.release_at = time.time() + release_delay
+    deadline = bls.release_at + timeout
+    release_polls = 0
+    db_ops_per_release_poll = None
+    while len(sink.arrivals) < series_count and time.time() < deadline:
+        ops_before = db_ops[0]
+        events = poll()
+        release_polls += 1
+        if events and db_ops_per_release_poll is None:
+            db_ops_per_release_poll = db_ops[0] - ops_before
+        time.sleep(poll_interval)
+
+    latencies = sorted((arrived - bls.release_at) * 1000 for arrived, _ in sink.arrivals)
+    shutdown()
+    stop.set()
+    bls.stop()
+    sink.stop()
+    snapshot = metrics.snapshot()
+    return {
+        'series': series_count,
+        'mode': mode,
+        'notifications': len(latencies),
+        'webhook_messages': sink.messages,
+        'latency_p50_ms': _percentile(latencies, 0.50),
+        'latency_p95_ms': _percentile(latencies, 0.95),
+        'latency_p99_ms': _percentile(latencies, 0.99),
+        'latency_max_ms': latencies[-1] if latencies else None,
+        'idle_polls_per_s': idle_polls / idle_seconds,
+        'page_polls_per_s': idle_polls / page_seconds,
+        'db_ops_per_idle_poll': db_ops_per_idle_poll,
+        'db_ops_per_release_poll': db_ops_per_release_poll,
+        'release_polls': release_polls,
+        'api_requests': bls.api_requests,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stage_metrics': snapshot['histograms'],
+        'destinations': snapshot['sections'].get('notify.destinations', {}),
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    """Prints the relative change of each metric against a previous results file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(s['series'], s['mode']): s for s in json.load(f)['scenarios']}
+    print(f"\nCompared with {baseline_path}:")
+    for scenario in results['scenarios']:
+        previous = baseline.get((scenario['series'], scenario['mode']))
+        if not previous:
+            continue
+        print(f"  {scenario['series']} series / {scenario['mode']}:")
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric), scenario.get(metric)
+            if old and new is not None:
+                print(f"    {metric:<26} {old:12.2f} -> {new:12.2f} ({(new - old) / old * 100:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--series', type=int, nargs='+', default=list(DEFAULT_SERIES_COUNTS))
+    parser.add_argument('--modes', nargs='+', choices=('sync', 'pipeline'), default=['sync', 'pipeline'])
+    parser.add_argument('--idle-polls', type=int, default=20)
+    parser.add_argument('--poll-interval', type=float, default=0.25, help='seconds between polls after the release')
+    parser.add_argument('--release-delay', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='write results JSON to this file')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    parser.add_argument('--child-result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_result:
+        # Scenario process: keep collector output out of the way, report through a file
+        sys.stdout = open(os.devnull, 'w')
+        result = run_scenario(args.series[0], args.modes[0], args.idle_polls, args.poll_interval,
+                              args.release_delay, args.timeout)
+        with open(args.child_result, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    scenarios = []
+    for series_count in args.series:
+        for mode in args.modes:
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+                result_path = f.name
+            command = [
+                sys.executable, os.path.abspath(__file__), '--child-result', result_path,
+                '--series', str(series_count), '--modes', mode,
+                '--idle-polls', str(args.idle_polls), '--poll-interval', str(args.poll_interval),
+                '--release-delay', str(args.release_delay), '--timeout', str(args.timeout),
+            ]
+            subprocess.run(command, check=True)
+            with open(result_path, 'r', encoding='utf-8') as f:
+                scenario = json.load(f)
+            os.unlink(result_path)
+            scenarios.append(scenario)
+            print(f"{series_count:>5} series {mode:<8} "
+                  f"latency p50/p95/p99 = {scenario['latency_p50_ms']:.0f}/{scenario['latency_p95_ms']:.0f}/"
+                  f"{scenario['latency_p99_ms']:.0f} ms, idle polls/s = {scenario['idle_polls_per_s']:.1f}, "
+                  f"db ops/idle poll = {scenario['db_ops_per_idle_poll']:.1f}, "
+                  f"db ops/release poll = {scenario['db_ops_per_release_poll']}, "
+                  f"peak RSS = {scenario['peak_rss_mb']:.0f} MB")
+
+    results = {
+        'benchmark': 'e2e',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'scenarios': scenarios,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Micro-benchmark and equivalence check for extract_nonfarm_data_from_html.
+
+Compares the precompiled-regex fast path against the BeautifulSoup fallback on
+the checked-in BLS release page (and a few variants of it), asserting that both
+produce identical results before timing them.
+
+    python benchmarks/bench_html_extract.py [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import data_collector  # noqa: E402
+
+FIXTURE = os.path.join(APP_DIR, 'BLS')
+
+def soup_extract(html_content):
+    """Reference implementation: full BeautifulSoup parse, as before the fast path."""
+    news_text = data_collector._find_pre_text_with_soup(html_content)
+    return data_collector._extract_nonfarm_fields(news_text) if news_text is not None else None
+
+def fast_extract(html_content):
+    news_text = data_collector.find_pre_text(html_content)
+    return data_collector._extract_nonfarm_fields(news_text) if news_text is not None else None
+
+def variants(page):
+    """The fixture plus edits the fast path must handle the same way as BeautifulSoup."""
+    yield 'fixture', page
+    yield 'uppercase tags', page.replace('<pre>', '<PRE>').replace('</pre>', '</PRE>')
+    yield 'pre attributes', page.replace('<pre>', '<pre class="release">')
+    yield 'inline markup', page.replace('increased by 177,000', 'increased by <b>177,000</b>')
+    yield 'entities', page.replace('Total nonfarm payroll', 'Total&#32;nonfarm payroll')
+
+def check_equivalence(page):
+    for name, html_content in variants(page):
+        assert data_collector.find_pre_text(html_content) == data_collector._find_pre_text_with_soup(html_content), \
+            f"{name}: <pre> text differs between the fast path and BeautifulSoup"
+        fast, reference = fast_extract(html_content), soup_extract(html_content)
+        assert fast == reference, f"{name}: fast path {fast!r} != BeautifulSoup {reference!r}"
+        print(f"  equivalent: {name:<16} {fast}")
+
+def bench(fn, html_content, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(html_content)
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        page = f.read()
+    print(f"Fixture: {FIXTURE} ({len(page):,} characters)")
+    check_equivalence(page)
+
+    end_to_end = bench(data_collector.extract_nonfarm_data_from_html, page, args.iterations)
+    fast = bench(fast_extract, page, args.iterations)
+    soup = bench(soup_extract, page, max(1, args.iterations // 10))
+    print(f"  fast path:         {fast * 1e6:10.1f} us/page")
+    print(f"  BeautifulSoup:     {soup * 1e6:10.1f} us/page")
+    print(f"  extract_nonfarm_data_from_html: {end_to_end * 1e6:10.1f} us/page")
+    print(f"  speedup:           {soup / fast:10.1f}x")
+
+if __name__ == '__main__':
+    main()
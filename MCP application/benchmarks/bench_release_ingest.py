@@ -0,0 +1,76 @@
+"""Throughput of release_archive.ingest on a synthetic archive of release pages.
+
+The checked-in `BLS` page is copied once per month going back --years years,
+with the reference month, release date and headline payroll figure rewritten,
+and a few deliberately malformed pages mixed in. The archive is ingested as a
+directory and as a .tar.gz, with one worker and with --workers workers.
+
+    python benchmarks/bench_release_ingest.py --years 30 --workers 4
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+import release_archive  # noqa: E402
+import storage  # noqa: E402
+
+MONTH_NAMES = [month.capitalize() for month in release_archive.MONTHS]
+
+def build_archive(directory, years, malformed=5):
+    with open(os.path.join(APP_DIR, 'BLS'), encoding='utf-8') as f:
+        template = f.read()
+    pages = 0
+    for offset in range(years * 12):
+        year, month = 2025 - offset // 12, 4 - offset % 12
+        if month < 1:
+            month += 12
+        page = (template
+                .replace('APRIL 2025', f'{MONTH_NAMES[month - 1].upper()} {year}')
+                .replace('Friday, May 2, 2025', f'Friday, {MONTH_NAMES[month % 12]} 3, {year + (month == 12)}')
+                .replace('increased by 177,000', f'increased by {100 + offset % 150},000'))
+        with open(os.path.join(directory, f'empsit_{year}_{month:02d}.htm'), 'w', encoding='utf-8') as f:
+            f.write(page)
+        pages += 1
+    for index in range(malformed):
+        with open(os.path.join(directory, f'broken_{index}.htm'), 'w', encoding='utf-8') as f:
+            f.write('<html><body>Access Denied</body></html>' if index % 2 else template[:20000])
+        pages += 1
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix='bench-release-ingest-')
+    try:
+        pages_dir = os.path.join(workdir, 'pages')
+        os.mkdir(pages_dir)
+        total = build_archive(pages_dir, args.years)
+        tarball = os.path.join(workdir, 'pages.tar.gz')
+        with tarfile.open(tarball, 'w:gz') as archive:
+            archive.add(pages_dir, arcname='pages')
+
+        print(f"{total} pages ({args.years} years of releases plus malformed pages)")
+        for label, path in (('directory', pages_dir), ('tar.gz', tarball)):
+            for workers in sorted({1, args.workers}):
+                storage.DATABASE_FILE = os.path.join(workdir, f'{label}-{workers}.db')
+                report = release_archive.ingest(path, workers=workers)
+                storage.close_connection()
+                print(f"  {label:<9} workers={workers:<3} {report.pages_per_second:8.1f} pages/s "
+                      f"({report.stored} stored, {len(report.skipped)} skipped)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Peak memory and parse time of BLS API responses: response.json() vs bls_stream.
+
+For growing series counts, a response body shaped like the real API's (20
+years of monthly points, with catalog and per-point calculations as requested
+by catalog=true / calculations=true) is generated by benchmarks/fakes.py and
+then parsed three ways, each measured with tracemalloc (the body itself is
+allocated before measuring starts; times are taken on a separate, untraced run):
+
+* json:      json.loads of the whole body, then extract_economic_data
+* records:   bls_stream.parse, keeping every series as compact records
+* streaming: bls_stream.iter_series, handing each series on and dropping it
+
+    python benchmarks/bench_stream.py --series 10 50 200 --years 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+import bls_stream  # noqa: E402
+import data_collector  # noqa: E402
+from fakes import FakeBLSServer  # noqa: E402
+
+def build_body(series_count, years, calculations=True):
+    fake = FakeBLSServer()
+    latest_year = fake.current_latest()[0]
+    series_ids = [f'CUUR0000SA{index:04d}' for index in range(series_count)]
+    response = fake.build_response(series_ids, latest_year - years + 1, latest_year)
+    for series in response['Results']['series']:
+        series['catalog'] = {'series_title': f"Synthetic series {series['seriesID']}", 'seasonality': 'Not Seasonally Adjusted'}
+        if calculations:
+            for point in series['data']:
+                point['footnotes'] = [{'code': 'P', 'text': 'preliminary'}] if point.get('latest') else [{}]
+                point['calculations'] = {
+                    'net_changes': {'1': '0.3', '3': '0.8', '6': '1.5', '12': '3.1'},
+                    'pct_changes': {'1': '0.1', '3': '0.3', '6': '0.6', '12': '1.2'},
+                }
+    return json.dumps(response).encode()
+
+def _chunks(body):
+    view = memoryview(body)
+    return (view[i:i + bls_stream.CHUNK_SIZE] for i in range(0, len(view), bls_stream.CHUNK_SIZE))
+
+def via_json(body):
+    data = json.loads(body)
+    return data, data_collector.extract_economic_data(data)
+
+def via_records(body):
+    data = bls_stream.parse(_chunks(body))
+    return data, data_collector.extract_economic_data(data)
+
+def via_streaming(body):
+    observations = 0
+    for series in bls_stream.iter_series(_chunks(body)):
+        observations += len(series)
+    return observations
+
+def measure(function, body):
+    """(ms, peak MB): timed untraced, since tracemalloc slows every allocation, then traced for the peak."""
+    started = time.perf_counter()
+    result = function(body)
+    elapsed = (time.perf_counter() - started) * 1000
+    del result
+    tracemalloc.start()
+    result = function(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--series', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--no-calculations', action='store_true', help='omit catalog footnotes and calculations')
+    args = parser.parse_args()
+
+    print(f"{'series':>7} {'body MB':>8} | {'json ms':>8} {'peak MB':>8} | {'records ms':>10} {'peak MB':>8} "
+          f"| {'stream ms':>9} {'peak MB':>8}")
+    for count in args.series:
+        body = build_body(count, args.years, calculations=not args.no_calculations)
+        row = [measure(function, body) for function in (via_json, via_records, via_streaming)]
+        print(f"{count:>7} {len(body) / 1e6:>8.1f} | {row[0][0]:>8.1f} {row[0][1]:>8.1f} | "
+              f"{row[1][0]:>10.1f} {row[1][1]:>8.1f} | {row[2][0]:>9.1f} {row[2][1]:>8.1f}")
+
+if __name__ == '__main__':
+    main()
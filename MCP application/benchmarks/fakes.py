@@ -0,0 +1,189 @@
+"""Local stand-ins for the BLS v2 API, the release page and a Discord webhook.
+
+FakeBLSServer answers POST /publicAPI/v2/timeseries/data/ like the BLS v2 API
+for any series IDs, and GET /news.release/empsit.nr0.htm with the checked-in
+`BLS` release page (with an ETag, so conditional GETs see 304s). It can be
+scripted to "release" a new month at a given moment: before `release_at` every
+series ends at `latest`, and afterwards one more month appears.
+
+FakeWebhookSink accepts webhook posts and records when each embed arrived.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLS_PAGE_FIXTURE = os.path.join(APP_DIR, 'BLS')
+
+API_PATH = '/publicAPI/v2/timeseries/data/'
+RELEASE_PAGE_PATH = '/news.release/empsit.nr0.htm'
+
+def _value(series_id, year, month):
+    """Deterministic, series-specific value for a period."""
+    seed = int(hashlib.md5(series_id.encode()).hexdigest()[:6], 16)
+    base = 50 + seed % 400
+    return f"{base + (year - 2000) * 1.5 + month * 0.1 + (seed % 7) * 0.01:.3f}"
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _Base:
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+class FakeBLSServer(_Base):
+    """Scriptable BLS v2 API and release-page server."""
+
+    def __init__(self, latest=(2026, 8), release_at=None, response_delay=0.0):
+        self.latest = latest
+        self.release_at = release_at  # time.time() after which one more month is published
+        self.response_delay = response_delay
+        self.api_requests = 0
+        self.page_requests = 0
+        with open(BLS_PAGE_FIXTURE, 'rb') as f:
+            self._page = f.read()
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self):
+        return self.base_url + API_PATH
+
+    @property
+    def release_page_url(self):
+        return self.base_url + RELEASE_PAGE_PATH
+
+    def released(self):
+        return self.release_at is not None and time.time() >= self.release_at
+
+    def current_latest(self):
+        year, month = self.latest
+        if self.released():
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return year, month
+
+    def page(self):
+        """The release page; after the release the headline payroll figure changes."""
+        if self.released():
+            return self._page.replace(b'increased by 177,000', b'increased by 201,000')
+        return self._page
+
+    def build_response(self, series_ids, start_year, end_year):
+        latest_year, latest_month = self.current_latest()
+        series = []
+        for series_id in series_ids:
+            data = []
+            for year in range(min(end_year, latest_year), start_year - 1, -1):
+                last_month = latest_month if year == latest_year else 12
+                for month in range(last_month, 0, -1):
+                    point = {
+                        'year': str(year), 'period': f'M{month:02d}', 'periodName': 'Month',
+                        'value': _value(series_id, year, month), 'footnotes': [{}],
+                    }
+                    if year == latest_year and month == latest_month:
+                        point['latest'] = 'true'
+                    data.append(point)
+            series.append({'seriesID': series_id, 'data': data})
+        return {
+            'status': 'REQUEST_SUCCEEDED',
+            'responseTime': int(time.time() * 1000) % 1000,
+            'message': [],
+            'Results': {'series': series},
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # avoid 40 ms delayed-ACK stalls on keep-alive connections
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with fake._lock:
+                    fake.api_requests += 1
+                if fake.response_delay:
+                    time.sleep(fake.response_delay)
+                response = fake.build_response(
+                    request['seriesid'], int(request['startyear']), int(request['endyear']))
+                self._send(200, json.dumps(response).encode(), {'Content-Type': 'application/json'})
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.page_requests += 1
+                page = fake.page()
+                etag = '"%s"' % hashlib.md5(page).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, headers={'ETag': etag})
+                else:
+                    self._send(200, page, {'ETag': etag, 'Content-Type': 'text/html'})
+
+        return Handler
+
+class FakeWebhookSink(_Base):
+    """Webhook endpoint that records the arrival time of every embed."""
+
+    def __init__(self, response_delay=0.0):
+        self.response_delay = response_delay
+        self.arrivals = []  # (time.time(), embed)
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return self.base_url + '/api/webhooks/0/benchmark'
+
+    def reset(self):
+        with self._lock:
+            self.arrivals = []
+            self.messages = 0
+
+    def _handler(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # avoid 40 ms delayed-ACK stalls on keep-alive connections
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                arrived = time.time()
+                with sink._lock:
+                    sink.messages += 1
+                    sink.arrivals.extend((arrived, embed) for embed in payload.get('embeds', []))
+                if sink.response_delay:
+                    time.sleep(sink.response_delay)
+                self.send_response(204)
+                self.send_header('X-RateLimit-Remaining', '5')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
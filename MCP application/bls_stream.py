@@ -0,0 +1,211 @@
+"""Incremental parser for BLS v2 API responses with compact observation records.
+
+response.json() materializes the whole body as nested dicts before anything
+can use it, and every data point costs a dict plus a footnotes list of dicts.
+Large requests (50 series x 20 years, with catalog or calculations) turn into
+tens of MB of short-lived objects.
+
+This parser reads the body chunk by chunk, finds the Results.series array and
+decodes one series object at a time, converting it immediately into a
+SeriesRecord of Observation records:
+
+* Observation uses __slots__; year and period strings are interned, so the
+  few hundred distinct codes are shared by every point
+* footnotes are shared, immutable tuples (almost every point carries the same
+  one or two)
+* per-point "calculations" are dropped; analytics computes its own changes
+
+Only the current series and an unconsumed tail of the body are held at once,
+so peak memory stays flat as the number of series grows. Records support the
+dict-style access the existing stages use (series['data'], point['value'],
+point.get('footnotes')), so they pass through extraction, change detection
+and the observation store unchanged.
+"""
+import codecs
+import json
+import re
+import sys
+
+CHUNK_SIZE = 64 * 1024  # bytes read from the response per step
+TRIM_THRESHOLD = 256 * 1024  # drop the consumed prefix of the text buffer beyond this
+
+_SERIES_ARRAY_RE = re.compile(r'"series"\s*:\s*\[')
+_STATUS_RE = re.compile(r'"status"\s*:\s*"([^"]*)"')
+_MESSAGE_RE = re.compile(r'"message"\s*:\s*')
+_WHITESPACE = ' \t\n\r'
+
+_footnote_cache = {}
+
+class Observation:
+    """One data point of a series."""
+    __slots__ = ('year', 'period', 'value', 'footnotes', 'latest')
+
+    def __init__(self, year, period, value, footnotes=(), latest=False):
+        self.year = year
+        self.period = period
+        self.value = value
+        self.footnotes = footnotes
+        self.latest = latest
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if isinstance(key, str) else default
+
+    def __repr__(self):
+        return f"Observation({self.year} {self.period} = {self.value})"
+
+class SeriesRecord:
+    """One series of a response: its ID, its Observations (newest first) and optional catalog."""
+    __slots__ = ('series_id', 'data', 'catalog')
+
+    _KEYS = {'seriesID': 'series_id', 'data': 'data', 'catalog': 'catalog'}
+
+    def __init__(self, series_id, data, catalog=None):
+        self.series_id = series_id
+        self.data = data
+        self.catalog = catalog
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        attribute = self._KEYS.get(key)
+        return getattr(self, attribute) if attribute else default
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"SeriesRecord({self.series_id}, {len(self.data)} observations)"
+
+def _shared_footnotes(footnotes):
+    """Returns one shared tuple per distinct footnote list; empty footnotes become ()."""
+    if not footnotes:
+        return ()
+    key = tuple((f.get('code'), f.get('text')) for f in footnotes if f)
+    if not key:
+        return ()
+    shared = _footnote_cache.get(key)
+    if shared is None:
+        shared = _footnote_cache[key] = tuple({'code': code, 'text': text} for code, text in key)
+    return shared
+
+def to_record(series):
+    """Converts one decoded series object into a compact SeriesRecord."""
+    intern = sys.intern
+    data = [
+        Observation(intern(point['year']), intern(point['period']), point['value'],
+                    _shared_footnotes(point.get('footnotes')), point.get('latest') == 'true')
+        for point in series.get('data') or []
+    ]
+    return SeriesRecord(series['seriesID'], data, series.get('catalog'))
+
+class _TextStream:
+    """Decoded text of a chunked byte stream with a read position and a trimmed prefix."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Appends the next chunk; returns False once the stream is exhausted."""
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            self.buffer += self._decoder.decode(b'', final=True)
+            return False
+        if self.pos > TRIM_THRESHOLD:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += self._decoder.decode(chunk)
+        return True
+
+    def skip(self, characters):
+        """Advances past any of `characters`, reading more as needed; returns the next character or ''."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in characters:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def rest(self):
+        while self.fill():
+            pass
+        return self.buffer[self.pos:]
+
+def iter_series(chunks, header=None):
+    """Yields a SeriesRecord for each element of Results.series as soon as it has been read.
+
+    `header`, when given, is filled with the response's 'status' and 'message'.
+    Raises ValueError for a body that is not valid JSON.
+    """
+    header = header if header is not None else {}
+    stream = _TextStream(chunks)
+    decoder = json.JSONDecoder()
+
+    # Read up to the opening bracket of the series array, picking up status and message on the way
+    while True:
+        match = _SERIES_ARRAY_RE.search(stream.buffer, stream.pos)
+        if match:
+            break
+        if not stream.fill():
+            # No series array (e.g. an error response): parse the whole, small body
+            whole = json.loads(stream.buffer)
+            header['status'] = whole.get('status')
+            header['message'] = whole.get('message', [])
+            for series in (whole.get('Results') or {}).get('series', []):
+                yield to_record(series)
+            return
+    prefix = stream.buffer[:match.start()]
+    status = _STATUS_RE.search(prefix)
+    header['status'] = status.group(1) if status else None
+    message = _MESSAGE_RE.search(prefix)
+    header['message'] = decoder.raw_decode(prefix, message.end())[0] if message else []
+    stream.pos = match.end()
+
+    while True:
+        character = stream.skip(_WHITESPACE + ',')
+        if character == ']':
+            break
+        if not character:
+            raise ValueError("BLS response ended inside the series array")
+        try:
+            series, end = decoder.raw_decode(stream.buffer, stream.pos)
+        except json.JSONDecodeError:
+            # Usually an element split across chunks; read on, and fail only at the end of the body
+            if not stream.fill():
+                raise
+            continue
+        stream.pos = end
+        yield to_record(series)
+
+    if header['status'] is None:
+        # Keys that follow Results are rare, but check the tail for the status
+        status = _STATUS_RE.search(stream.rest())
+        header['status'] = status.group(1) if status else None
+
+def parse(chunks):
+    """Parses a whole response into {'status', 'message', 'Results': {'series': [SeriesRecord]}}."""
+    header = {}
+    series = list(iter_series(chunks, header))
+    return {'status': header.get('status'), 'message': header.get('message', []), 'Results': {'series': series}}
+
+def parse_bytes(content, chunk_size=CHUNK_SIZE):
+    """parse() for a body that is already in memory."""
+    view = memoryview(content)
+    return parse(view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
@@ -0,0 +1,109 @@
+"""Revision-aware change detection for BLS API responses.
+
+Each series in a response is hashed over its (year, period, value) points. A
+series whose hash matches the one seen on the previous poll is skipped
+without touching the database. The rest are diffed period by period against
+the observations table (observation_store.store_series writes only what
+differs), and each difference is classified:
+
+* a release: the series' newest period in the payload was not stored before
+* a revision: a period that was already stored now has a different value
+
+Per-poll work is therefore proportional to the series that changed, and a
+revised month is reported as a revision instead of looking like a new release.
+
+detect() writes through the caller's transaction, and the new hashes are only
+recorded by remember() once that transaction has committed (see
+data_collector.persist_response). A poll whose events fail to save therefore
+rolls back its observations too, and the same response is diffed again, and
+its events re-emitted, on the next poll.
+"""
+import hashlib
+import logging
+
+import metrics
+import observation_store
+
+logger = logging.getLogger(__name__)
+
+_hashes = {}  # series_id -> digest of the points last stored
+
+class ChangeSet:
+    """What one response changed: newly released periods and revised ones."""
+    __slots__ = ('releases', 'revisions', 'skipped', 'digests')
+
+    def __init__(self):
+        self.releases = {}  # series_id -> (year, period, value) of the newly published period
+        self.revisions = []  # (series_id, year, period, old_value, new_value)
+        self.skipped = 0  # series whose hash was unchanged
+        self.digests = {}  # series_id -> digest of the points stored, recorded by remember() after commit
+
+    def __bool__(self):
+        return bool(self.releases or self.revisions)
+
+    def __repr__(self):
+        return f"ChangeSet({len(self.releases)} release(s), {len(self.revisions)} revision(s), {self.skipped} skipped)"
+
+def series_digest(points):
+    """Order-sensitive digest of a series' (year, period, value) points."""
+    digest = hashlib.blake2b(digest_size=16)
+    for point in points:
+        digest.update(f"{point['year']}\x1f{point['period']}\x1f{point['value']}\x1e".encode())
+    return digest.digest()
+
+def _newest_period(points):
+    periodic = [(int(p['year']), p['period'], p['value'])
+                for p in points if p['period'] != observation_store.ANNUAL_AVERAGE_PERIOD]
+    return max(periodic) if periodic else None
+
+def detect(data, conn=None):
+    """Stores the changed series of a BLS response and returns the resulting ChangeSet.
+
+    Joins the caller's transaction when there is one; database errors propagate
+    so the caller can roll back. Pass the result to remember() after commit.
+    """
+    result = ChangeSet()
+    if not data or data.get('status') != 'REQUEST_SUCCEEDED':
+        return result
+
+    candidates, digests = [], {}
+    for series in data['Results']['series']:
+        series_id = series['seriesID']
+        digest = series_digest(series.get('data') or [])
+        if _hashes.get(series_id) == digest:
+            result.skipped += 1
+            continue
+        candidates.append(series)
+        digests[series_id] = digest
+    metrics.incr('changes.series_skipped', result.skipped)
+    if not candidates:
+        return result
+
+    with metrics.timer('db.store_observations_ms'):
+        changes = observation_store.store_series(candidates, conn)
+    result.digests = digests
+
+    for series in candidates:
+        series_id = series['seriesID']
+        change = changes.get(series_id)
+        if not change:
+            continue
+        newest = _newest_period(series.get('data') or [])
+        if newest and any((year, period) == newest[:2] for year, period, _ in change['new']):
+            result.releases[series_id] = newest
+        for year, period, old_value, new_value in change['changed']:
+            if period != observation_store.ANNUAL_AVERAGE_PERIOD:
+                result.revisions.append((series_id, year, period, old_value, new_value))
+    metrics.incr('changes.releases', len(result.releases))
+    metrics.incr('changes.revisions', len(result.revisions))
+    if result:
+        logger.info("Detected %r", result)
+    return result
+
+def remember(changes):
+    """Records the hashes of a ChangeSet's series once the transaction that stored them has committed."""
+    _hashes.update(changes.digests)
+
+def reset():
+    """Forgets every series hash, so the next response is diffed in full."""
+    _hashes.clear()
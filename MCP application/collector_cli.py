@@ -0,0 +1,247 @@
+"""Command-line entry point for the collector.
+
+    python collector_cli.py poll-once [--group cpi ...]   # one poll, e.g. from cron
+    python collector_cli.py daemon [--sync] [--no-notifier] [--lease [NAME]] [--metrics-port N] [--metrics-file PATH]
+    python collector_cli.py backfill [--years 20]
+    python collector_cli.py notify-latest
+    python collector_cli.py ingest-releases PATH [--workers N]   # archived release pages
+    python collector_cli.py poll-once|daemon|backfill --record FILE.jsonl.gz   # archive raw responses
+    python collector_cli.py replay FILE.jsonl.gz [--speed 1]   # rerun them offline
+
+Only the modules a subcommand needs are imported, and only when it runs:
+argument parsing alone loads no third-party package, poll-once never loads
+NumPy unless there is new data to score (or bs4, asyncio and the HTTP metrics
+server at all), and notify-latest skips the collector entirely. A one-shot
+poll also skips warming the in-memory dedup set, which would read every
+stored event key; schema migrations are a single PRAGMA user_version check
+once the database is current.
+"""
+import argparse
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+def _configure_logging(level):
+    logging.basicConfig(level=level.upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+def _series_ids(groups=None):
+    import series_registry
+
+    series_ids = series_registry.get_series_ids(groups)
+    if not series_ids:
+        logger.error("No series configured in the series registry. Exiting.")
+    return series_ids
+
+def _api_key():
+    import data_collector
+
+    api_key = data_collector.get_bls_api_key()
+    if not api_key:
+        logger.error("BLS API key not available. Exiting.")
+    return api_key
+
+def poll_once(args):
+    """Runs a single fetch -> detect -> save -> notify cycle."""
+    import data_collector
+    import event_dedup
+
+    # One poll checks a handful of keys; loading every stored key would cost more than it saves
+    event_dedup.PRELOAD_KNOWN_KEYS = False
+    data_collector.init_database(warm_cache=False)
+    api_key = _api_key()
+    series_ids = _series_ids(args.group)
+    if not api_key or not series_ids:
+        return 1
+    events = data_collector.poll_once(api_key, series_ids)
+    logger.info("Poll finished with %d new event(s).", len(events))
+    return 0
+
+def daemon(args):
+    """Release-calendar-aware monitoring loop."""
+    import threading
+
+    import data_collector
+    import metrics
+    import notification_dispatcher
+    import release_scheduler
+
+    # Metrics export: --metrics-port serves GET /metrics on localhost, --metrics-file writes JSON snapshots
+    if args.metrics_port is not None:
+        metrics.start_http_server(args.metrics_port)
+    if args.metrics_file:
+        metrics.start_snapshot_writer(args.metrics_file)
+
+    data_collector.init_database()
+    api_key = _api_key()
+    series_ids = _series_ids(args.group)
+    if not api_key or not series_ids:
+        return 1
+
+    if args.no_notifier:
+        # notifier.py delivers alerts from the event log in its own process
+        data_collector.INLINE_NOTIFY = False
+    else:
+        # Deliver outbox notifications left over from earlier runs, and retry failed ones, in the background
+        threading.Thread(target=notification_dispatcher.run_dispatcher, name='outbox-dispatcher', daemon=True).start()
+
+    lease = None
+    if args.lease:
+        # Redundant instances: only the lease holder polls; the others stand by with warm caches
+        import leader_lease
+        import signal
+        # Service managers stop with SIGTERM; exit normally so the lease is released below
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        lease = leader_lease.Lease(args.lease)
+        data_collector.LEASE = lease
+        lease.start(on_acquire=data_collector.on_lease_acquired)
+        # Give the first takeover attempt a chance, so a sole instance does not skip its startup poll
+        if not lease.wait_until_leader(timeout=leader_lease.STANDBY_CHECK_INTERVAL):
+            logger.info("Lease '%s' is held by another instance; standing by.", args.lease)
+
+    # Sleeps until just before a scheduled release, burst-polls until the new values appear, then backs off again
+    try:
+        if args.sync:
+            # Compatibility mode: each poll runs fetch -> notify strictly in sequence
+            poll = lambda ids: data_collector.poll_once(api_key, ids)
+            if lease:
+                poll = leader_lease.guarded(poll, lease, data_collector.keep_warm)
+            release_scheduler.run(poll, series_ids)
+        else:
+            import pipeline
+            pipeline.run_forever(api_key, series_ids, lease=lease)
+    finally:
+        if lease:
+            # Lets a standby take over at its next check instead of after the lease expires
+            lease.release()
+    return 0
+
+def backfill(args):
+    """One-off history load into the observations table."""
+    import data_collector
+
+    data_collector.init_database(warm_cache=False)
+    api_key = _api_key()
+    series_ids = _series_ids(args.group)
+    if not api_key or not series_ids:
+        return 1
+    changes = data_collector.backfill_observations(api_key, series_ids, args.years)
+    return 0 if changes else 1
+
+def ingest_releases(args):
+    """Bulk-parses a directory or tarball of archived release pages into release_archive."""
+    import release_archive
+    import storage
+
+    storage.init_database()
+    report = release_archive.ingest(args.path, workers=args.workers, batch_size=args.batch_size)
+    logger.info("Parsed %d page(s) in %.1fs (%.1f pages/s): %d stored, %d skipped.",
+                report.pages, report.elapsed, report.pages_per_second, report.stored, len(report.skipped))
+    for source, reason in report.skipped:
+        logger.info("  skipped %s: %s", source, reason)
+    return 0 if report.stored else 1
+
+def replay_recording(args):
+    """Feeds a traffic recording through the pipeline into a scratch database and reports stage timings."""
+    import shutil
+    import tempfile
+
+    import storage
+
+    scratch = None
+    database = args.database
+    if not database:
+        scratch = tempfile.mkdtemp(prefix='replay-')
+        database = os.path.join(scratch, 'replay.db')
+    storage.DATABASE_FILE = database
+
+    import data_collector
+    import replay
+
+    data_collector.DATABASE_FILE = database
+    try:
+        data_collector.init_database(warm_cache=False)
+        report = replay.replay(args.path, speed=args.speed)
+    finally:
+        storage.close_connection()
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+    logger.info("Replayed %d response(s) (%d API, %d page) spanning %.1fs in %.2fs: %.1f responses/s, "
+                "%d event(s), %d notification(s).", report.records, report.api_responses, report.pages,
+                report.recorded_span, report.elapsed, report.records_per_second, report.events, report.notifications)
+    for name, summary in report.stages.items():
+        logger.info("  %-28s n=%-5d p50=%s p95=%s max=%s ms", name, summary['count'], summary['p50'], summary['p95'],
+                    summary['max'])
+    return 0 if report.records else 1
+
+def notify_latest(args):
+    """Sends the most recent stored event to the default webhook."""
+    import notification_service
+
+    latest_event = notification_service.get_latest_event_from_db()
+    if not latest_event:
+        logger.warning("No events found in the database to send notification.")
+        return 1
+    notification_service.send_notification(latest_event)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="BLS economic event collector.")
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'INFO'),
+                        help='DEBUG, INFO, WARNING or ERROR (default: $LOG_LEVEL or INFO)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    poll = commands.add_parser('poll-once', help='run one poll and exit')
+    poll.set_defaults(handler=poll_once)
+
+    run = commands.add_parser('daemon', help='poll around scheduled releases until interrupted')
+    run.add_argument('--sync', action='store_true', help='run each poll strictly in sequence (no pipeline)')
+    run.add_argument('--no-notifier', action='store_true', help='only write events; notifier.py delivers them')
+    run.add_argument('--lease', nargs='?', const='collector',
+                     help='poll only while holding this lease in the database (default name: %(const)s)')
+    run.add_argument('--metrics-port', type=int, help='serve GET /metrics on this localhost port')
+    run.add_argument('--metrics-file', help='periodically write a metrics snapshot to this JSON file')
+    run.set_defaults(handler=daemon)
+
+    history = commands.add_parser('backfill', help='load history into the observations table and exit')
+    history.add_argument('--years', type=int, default=20, help='years of history per series (default: %(default)s)')
+    history.set_defaults(handler=backfill)
+
+    for command in (poll, run, history):
+        command.add_argument('--group', action='append', help='only series in this series.json group (repeatable)')
+        command.add_argument('--record', metavar='FILE', help='append every raw BLS response to this .jsonl.gz file')
+
+    latest = commands.add_parser('notify-latest', help='send the most recent stored event to the webhook')
+    latest.set_defaults(handler=notify_latest)
+
+    ingest = commands.add_parser('ingest-releases', help='parse archived release pages into the database')
+    ingest.add_argument('path', help='directory, tarball or single saved release page')
+    ingest.add_argument('--workers', type=int, help='parser processes (default: CPU count)')
+    ingest.add_argument('--batch-size', type=int, default=500, help='pages per database transaction (default: %(default)s)')
+    ingest.set_defaults(handler=ingest_releases)
+
+    rerun = commands.add_parser('replay', help='replay a --record file through the pipeline, offline')
+    rerun.add_argument('path', help='recording written by --record')
+    rerun.add_argument('--speed', type=float, default=0.0,
+                       help='multiple of the recorded pace; 1 is real time, 0 as fast as possible (default)')
+    rerun.add_argument('--database', help='keep the replay database here (default: a temporary file)')
+    rerun.set_defaults(handler=replay_recording)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    _configure_logging(args.log_level)
+    if getattr(args, 'record', None):
+        import traffic_recorder
+        traffic_recorder.start(args.record)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if getattr(args, 'record', None):
+            traffic_recorder.stop()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,123 +1,174 @@
 import requests
-from bs4 import BeautifulSoup
-import time
 import re
+import html
 import json
+import logging
 import os
+import sys
+import threading
 from datetime import datetime # Import datetime to add timestamps
 import sqlite3 # Import sqlite3
-import notification_service # Import notification_service
+import bls_stream
+import change_detector
+import event_log
+import observation_store
+import event_dedup
+import fetch_planner
+import http_client
+import metrics
+import series_registry
+import storage
+
+logger = logging.getLogger(__name__)
 
 # 美國勞工統計局 (BLS) 非農就業數據新聞稿 URL
 BLS_NONFARM_URL = "https://www.bls.gov/news.release/empsit.nr0.htm"
 
-BLS_API_BASE_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
+BLS_API_BASE_URL = os.environ.get('BLS_API_URL') or "https://api.bls.gov/publicAPI/v2/timeseries/data/"
 API_KEY_FILE = 'api_key.txt'
 
-DATABASE_FILE = 'economic_events.db'
+DATABASE_FILE = storage.DATABASE_FILE
 
-def is_event_in_database(series_id, year, period, value):
-    """Checks if an event with the given series_id, year, period, and value already exists in the database."""
-    conn = None
-    exists = False
-    try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+# Deliver notifications from this process right after each save. Turn off (INLINE_NOTIFY=0 or
+# --no-notifier) when notifier.py runs as its own process; collection then only writes events.
+INLINE_NOTIFY = os.environ.get('INLINE_NOTIFY', '1') != '0'
 
-        print(f"Checking database for event: series_id={series_id}, year={year}, period={period}, value={value}")
+# The leader_lease.Lease this instance polls under when several collectors share the database
+# (collector_cli.py daemon --lease). Observations and events are then written only with a current fencing epoch.
+LEASE = None
+_standby_offset = None  # event log offset up to which a standby has folded keys into event_dedup
 
-        cursor.execute("""
-            SELECT 1 FROM events
-            WHERE series_id = ? AND year = ? AND period = ? AND value = ?
-            LIMIT 1;
-        """, (series_id, year, period, value))
+# 上次成功提取的新聞稿數據，配合條件式請求 (304) 使用
+_last_nonfarm_data = None
 
-        row = cursor.fetchone()
-        if row:
-            exists = True
-            print(f"Event found in database: series_id={series_id}, year={year}, period={period}, value={value}")
-        else:
-            print(f"Event NOT found in database: series_id={series_id}, year={year}, period={period}, value={value}")
+def is_event_in_database(series_id, year, period, value):
+    """Checks if an event with the given series_id, year, period, and value already exists in the database."""
+    key = event_dedup.event_key(series_id, year, period, value)
+    return not find_new_event_keys([key])
 
+def find_new_event_keys(keys):
+    """Returns the event keys not yet stored, using one query per batch of unseen keys."""
+    try:
+        with metrics.timer('db.dedup_lookup_ms'):
+            return event_dedup.find_new_keys(keys)
     except sqlite3.Error as e:
-        print(f"Database error while checking for event existence: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Database error while checking for new events: %s", e)
+        return list(keys)
+
+# 預先編譯的正則表達式，避免每次呼叫都重新編譯
+PRE_BLOCK_RE = re.compile(r"<pre\b[^>]*>(.*?)</pre\s*>", re.IGNORECASE | re.DOTALL)
+HTML_TAG_RE = re.compile(r"<[^>]*>")
+PAYROLL_RE = re.compile(r"Total nonfarm payroll employment (?:increased|decreased) by (\d+,?\d*)")
+UNEMPLOYMENT_RE = re.compile(r"the unemployment rate was\s*(?:unchanged at|was|rose to|declined to)\s*(\d+\.?\d*)\s*percent")
+RELEASE_DATE_RE = re.compile(r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}")
+
+def _extract_nonfarm_fields(news_text):
+    """從新聞稿純文字中提取非農就業人數變化、失業率與發布日期"""
+    data = {}
+    payroll_match = PAYROLL_RE.search(news_text)
+    if payroll_match:
+        data['nonfarm_payroll_change'] = payroll_match.group(1)
+    unemployment_match = UNEMPLOYMENT_RE.search(news_text)
+    if unemployment_match:
+        data['unemployment_rate'] = unemployment_match.group(1)
+    date_match = RELEASE_DATE_RE.search(news_text)
+    if date_match:
+        data['release_date'] = date_match.group(0)
+    return data
+
+def find_pre_text(html_content):
+    """快速路徑：只定位並解碼第一個 <pre> 區塊，不建立完整的 DOM 樹；找不到時回傳 None (release_archive 亦共用)"""
+    pre_match = PRE_BLOCK_RE.search(html_content)
+    if not pre_match:
+        return None
+    return html.unescape(HTML_TAG_RE.sub('', pre_match.group(1)))
 
-    return exists
+def _find_pre_text_with_soup(html_content):
+    """備援路徑：以 BeautifulSoup 完整解析 HTML 後取得 <pre> 文字"""
+    from bs4 import BeautifulSoup # 只在備援路徑才需要 bs4
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    # 查找包含新聞稿文本的 <pre> 標籤
+    pre_tag = soup.find('pre')
+    return pre_tag.get_text() if pre_tag else None
 
 def extract_nonfarm_data_from_html(html_content):
-    """從 BLS 非農就業數據新聞稿的 HTML 內容中提取數據"""
-    print("正在從提供的 HTML 內容中提取數據...")
+    """從 BLS 非農就業數據新聞稿的 HTML 內容中提取數據
+
+    先以預編譯正則直接擷取 <pre> 區塊 (快速路徑)；若找不到區塊或無法匹配任何數據，
+    才退回以 BeautifulSoup 完整解析。
+    """
+    logger.debug("正在從提供的 HTML 內容中提取數據...")
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 查找包含新聞稿文本的 <pre> 標籤
-        pre_tag = soup.find('pre')
-
-        if pre_tag:
-            news_text = pre_tag.get_text()
-
-            # 使用更穩健的正則表達式提取關鍵數據和日期
-            payroll_match = re.search(r"Total nonfarm payroll employment (?:increased|decreased) by (\d+,?\d*)", news_text)
-            unemployment_match = re.search(r"the unemployment rate was\s*(?:unchanged at|was|rose to|declined to)\s*(\d+\.?\d*)\s*percent", news_text)
-            date_match = re.search(r"(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},\s+\d{4}", news_text)
-
-            data = {}
-            if payroll_match:
-                data['nonfarm_payroll_change'] = payroll_match.group(1)
-            if unemployment_match:
-                data['unemployment_rate'] = unemployment_match.group(1)
-            if date_match:
-                data['release_date'] = date_match.group(0)
-
-            if data:
-                print(f"成功提取到數據: {data}")
-                return data
-            else:
-                print("未在提供的 HTML 內容中找到非農就業數據或日期。請檢查提取邏輯或內容。")
+        data = None
+        news_text = find_pre_text(html_content)
+        if news_text is not None:
+            data = _extract_nonfarm_fields(news_text)
+
+        if not data:
+            news_text = _find_pre_text_with_soup(html_content)
+            if news_text is None:
+                logger.warning("未在提供的 HTML 內容中找到包含新聞稿文本的 <pre> 標籤。")
                 return None
+            data = _extract_nonfarm_fields(news_text)
 
+        if data:
+            logger.info("成功提取到數據: %s", data)
+            return data
         else:
-            print("未在提供的 HTML 內容中找到包含新聞稿文本的 <pre> 標籤。")
+            logger.warning("未在提供的 HTML 內容中找到非農就業數據或日期。請檢查提取邏輯或內容。")
             return None
 
     except Exception as e:
-        print(f"處理 HTML 內容時發生錯誤: {e}")
+        logger.error("處理 HTML 內容時發生錯誤: %s", e)
         return None
 
 def fetch_nonfarm_data_via_requests():
     """通過 requests 從 BLS 網站抓取非農就業數據 (可能被阻擋)"""
-    print(f"正在嘗試通過 requests 從 {BLS_NONFARM_URL} 抓取數據...")
+    logger.debug("正在嘗試通過 requests 從 %s 抓取數據...", BLS_NONFARM_URL)
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Referer': 'https://www.bls.gov/'
     }
+    global _last_nonfarm_data
+    import traffic_recorder
     try:
-        response = requests.get(BLS_NONFARM_URL, headers=headers)
+        response = http_client.conditional_get(BLS_NONFARM_URL, headers=headers)
+        traffic_recorder.capture(traffic_recorder.RELEASE_PAGE, {'url': BLS_NONFARM_URL}, response.status_code, response.content)
+        if response.status_code == 304:
+            # 頁面自上次抓取後未變更，直接沿用上次的提取結果
+            metrics.incr('release_page.not_modified')
+            logger.debug("新聞稿頁面未變更 (304 Not Modified)，沿用上次提取結果。")
+            return _last_nonfarm_data
         response.raise_for_status()
         # 如果成功獲取，則調用新的提取函數
-        return extract_nonfarm_data_from_html(response.text)
+        with metrics.timer('parse.release_page_ms'):
+            _last_nonfarm_data = extract_nonfarm_data_from_html(response.text)
+        return _last_nonfarm_data
 
     except requests.exceptions.RequestException as e:
-        print(f"通過 requests 抓取數據時發生錯誤: {e}")
+        logger.error("通過 requests 抓取數據時發生錯誤: %s", e)
         return None
     except Exception as e:
-        print(f"處理數據時發生錯誤: {e}")
+        logger.error("處理數據時發生錯誤: %s", e)
         return None
 
 def get_bls_api_key():
     """Reads the BLS API key from api_key.txt."""
     if not os.path.exists(API_KEY_FILE):
-        print(f"Error: API key file '{API_KEY_FILE}' not found.")
-        print("Please create a file named api_key.txt in the project root and paste your API key inside.")
+        logger.error("API key file '%s' not found. Please create a file named api_key.txt "
+                     "in the project root and paste your API key inside.", API_KEY_FILE)
         return None
     with open(API_KEY_FILE, 'r') as f:
         return f.read().strip()
 
-def fetch_bls_data(api_key, series_ids, start_year, end_year):
-    """Fetches data from the BLS Public Data API."""
+def _post_bls_request(api_key, series_ids, start_year, end_year, stream=False):
+    """Posts one BLS API request on the shared keep-alive session.
+
+    The fetch planner reserved quota for the first attempt; every retry
+    reserves one more query, and is not made once the daily quota is spent.
+    With stream=True the body is left unread for iter_content(); the caller closes the response.
+    """
     headers = {'Content-type': 'application/json'}
     # Construct the request payload
     data = json.dumps({
@@ -126,16 +177,83 @@ def fetch_bls_data(api_key, series_ids, start_year, end_year):
         "endyear": str(end_year),
         "registrationkey": api_key
     })
-
+    response = http_client.request('POST', BLS_API_BASE_URL, headers=headers, data=data, stream=stream,
+                                   before_retry=lambda: fetch_planner.reserve_quota(1, registered=bool(api_key)) == 1)
     try:
-        response = requests.post(BLS_API_BASE_URL, headers=headers, data=data)
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-        data = response.json()
-        return data
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data from BLS API: {e}")
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+    return response
+
+def _recorded_request(series_ids, start_year, end_year):
+    return {'seriesid': list(series_ids), 'startyear': str(start_year), 'endyear': str(end_year)}
+
+def stream_bls_series(api_key, series_ids, start_year, end_year, header=None):
+    """Yields each series of a BLS API response as a bls_stream.SeriesRecord while the body downloads.
+
+    `header` is filled with the response's 'status' and 'message' before the
+    first series is yielded. Raises requests' exceptions and ValueError.
+    """
+    import traffic_recorder
+    response = _post_bls_request(api_key, series_ids, start_year, end_year, stream=True)
+    try:
+        chunks = response.iter_content(bls_stream.CHUNK_SIZE)
+        if traffic_recorder.is_active():
+            chunks = traffic_recorder.tee(traffic_recorder.BLS_API, _recorded_request(series_ids, start_year, end_year),
+                                          response.status_code, chunks)
+        yield from bls_stream.iter_series(chunks, header)
+        if traffic_recorder.is_active():
+            # The parser stops at the end of the series array; read the short tail so the recording is whole
+            for _ in chunks:
+                pass
+    finally:
+        response.close()
+
+def fetch_bls_data(api_key, series_ids, start_year, end_year):
+    """Fetches data from the BLS Public Data API, parsing the body as it streams in."""
+    try:
+        header = {}
+        with metrics.timer('parse.bls_json_ms'):
+            series = list(stream_bls_series(api_key, series_ids, start_year, end_year, header))
+        return {'status': header.get('status'), 'message': header.get('message', []), 'Results': {'series': series}}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error("Error fetching data from BLS API: %s", e)
         return None
 
+def bls_fingerprint_key(series_ids, start_year, end_year):
+    """The http_client fingerprint key of one BLS API request."""
+    return (tuple(series_ids), str(start_year), str(end_year))
+
+def fetch_bls_data_if_changed(api_key, series_ids, start_year, end_year):
+    """Fetches BLS data, skipping the JSON parse when the body matches the previous poll.
+
+    Returns (data, changed). data is None when the request failed or when the
+    response is unchanged, in which case there is nothing to extract or process.
+    The body's fingerprint is only staged: the caller commits it with
+    http_client.commit_fingerprints() once the data has been persisted, so a
+    response that failed to save is processed again. Bodies whose status is not
+    REQUEST_SUCCEEDED are never fingerprinted.
+    """
+    import traffic_recorder
+    fingerprint_key = bls_fingerprint_key(series_ids, start_year, end_year)
+    try:
+        response = _post_bls_request(api_key, series_ids, start_year, end_year)
+        traffic_recorder.capture(traffic_recorder.BLS_API, _recorded_request(series_ids, start_year, end_year),
+                                 response.status_code, response.content)
+        if http_client.is_unchanged(fingerprint_key, response.content):
+            metrics.incr('api.unchanged_responses')
+            return None, False
+        with metrics.timer('parse.bls_json_ms'):
+            data = bls_stream.parse_bytes(response.content)
+        if data.get('status') != 'REQUEST_SUCCEEDED':
+            http_client.discard_fingerprints([fingerprint_key])
+        return data, True
+    except (requests.exceptions.RequestException, ValueError) as e:
+        http_client.forget(fingerprint_key)
+        logger.error("Error fetching data from BLS API: %s", e)
+        return None, True
+
 def extract_economic_data(data):
     """Extracts and formats economic data from the BLS API response."""
     extracted_data = {}
@@ -174,18 +292,33 @@ def extract_economic_data(data):
                     'previous': None # No previous data available
                 }
             else:
-                 print(f"Warning: Not enough data points ({len(series['data'])}) for series {series_id} to get latest and previous.")
+                 logger.warning("Not enough data points (%d) for series %s to get latest and previous.",
+                                len(series['data']), series_id)
                  extracted_data[series_id] = None # No data available
 
     return extracted_data
 
 def process_economic_data(extracted_data):
     """Processes extracted economic data and creates data release events."""
-    print("\n--- Processing Economic Data and Creating Data Release Events ---")
+    logger.debug("--- Processing Economic Data and Creating Data Release Events ---")
     processed_events = []
 
     current_time = datetime.now().isoformat()
 
+    # Resolve which latest data points are new with one batched lookup instead of one query per series
+    candidate_keys = [
+        event_dedup.event_key(series_id, d['latest']['year'], d['latest']['period'], d['latest']['value'])
+        for series_id, d in extracted_data.items()
+        if d and d.get('latest')
+    ]
+    new_keys = set(find_new_event_keys(candidate_keys))
+
+    # MoM/YoY changes, surprise and severity for the series with new data, computed in one vectorized pass
+    metrics_by_series = {}
+    if new_keys:
+        import analytics # NumPy is only needed once there is new data to score
+        metrics_by_series = analytics.analyze_series({key[0] for key in new_keys})
+
     # Create Data Release Events for each successfully extracted data point
     for series_id, data_points_dict in extracted_data.items():
         if data_points_dict and data_points_dict.get('latest'):
@@ -195,41 +328,36 @@ def process_economic_data(extracted_data):
             year = latest_data['year']
             period = latest_data['period']
             value = latest_data['value']
-            previous_value = previous_data['value'] if previous_data else 'N/A'
+            if previous_data:
+                previous_value = previous_data['value']
+            else:
+                # The poll window may hold only the latest point (e.g. a January release); use stored history
+                previous_observation = observation_store.get_previous_observation(series_id, year, period)
+                previous_value = previous_observation[2] if previous_observation else 'N/A'
 
             # --- 模擬預期值 (Simulated Expected Value) - 固定值用於模型測試 ---
             # IMPORTANT: 在實際系統中，這部分需要從金融數據提供商獲取真實的預期值。
-            #            目前的實現是固定值，僅用於模型測試和功能展示。
-            simulated_expected_value = "N/A" # 預設值，如果沒有特定模擬值則顯示 N/A
-            # 根據 series_id 設定模擬的固定預期值
-            if series_id == 'LNS14000000':
-                 simulated_expected_value = "~3.9%" # 模擬失業率預期值
-            elif series_id == 'CES0000000001':
-                 simulated_expected_value = "~180K" # 模擬非農就業人數預期值
-            elif series_id == 'CUUR0000SA0':
-                 simulated_expected_value = "~3.4%" # 模擬 CPI 預期值
-            elif series_id == 'WPUID000000':
-                 simulated_expected_value = "~2.0%" # 模擬 PPI 預期值
+            #            目前的實現是固定值 (設定於 series.json)，僅用於模型測試和功能展示。
+            simulated_expected_value = series_registry.expected_value(series_id)
             # -----------------------------------------------------------
 
             # Check if this event already exists in the database
-            if not is_event_in_database(series_id, year, period, value):
+            if event_dedup.event_key(series_id, year, period, value) in new_keys:
 
-                series_name = "Unknown Series"
                 # Map series_id to a human-readable name
-                if series_id == 'LNS14000000':
-                    series_name = "Unemployment Rate"
-                elif series_id == 'CES0000000001':
-                    series_name = "Nonfarm Payroll"
-                elif series_id == 'CUUR0000SA0':
-                    series_name = "CPI (All items)"
-                elif series_id == 'WPUID000000':
-                     series_name = "PPI (All commodities)"
+                series_name = series_registry.series_name(series_id)
 
                 event_type = "Data Release"
                 # Update event description to include previous and expected values
                 event_description = f"{series_name} data released: Latest = {value}, Previous = {previous_value}, Expected = {simulated_expected_value}, Period = {year} {period}"
 
+                # Analytics describe the stored latest point, which must be this release
+                series_metrics = metrics_by_series.get(series_id)
+                if series_metrics and (str(series_metrics['year']), series_metrics['period']) != (str(year), period):
+                    series_metrics = None
+                if series_metrics and analytics.format_metrics(series_metrics):
+                    event_description += f", {analytics.format_metrics(series_metrics)}"
+
                 event = {
                     "type": event_type,
                     "description": event_description,
@@ -240,142 +368,346 @@ def process_economic_data(extracted_data):
                     "period": period,
                     "timestamp": current_time,
                     "source": "BLS API",
-                    "series_id": series_id
+                    "series_id": series_id,
+                    "severity": series_metrics['severity'] if series_metrics else 'unknown',
+                    "mom_change": series_metrics['mom_change'] if series_metrics else None,
+                    "yoy_pct": series_metrics['yoy_pct'] if series_metrics else None,
+                    "surprise_z": series_metrics['surprise_z'] if series_metrics else None
                 }
                 processed_events.append(event)
-                print(f"Created NEW Event: {event_description}") # Indicate it's a new event
+                logger.info("Created NEW Event: %s", event_description) # Indicate it's a new event
             else:
-                print(f"Event for {series_id} ({year} {period}, Value: {value}) already exists in database. Skipping notification and save.")
+                logger.debug("Event for %s (%s %s, Value: %s) already exists in database. Skipping notification and save.",
+                             series_id, year, period, value)
+
+    metrics.incr('events.created', len(processed_events))
 
     # TODO: Refine event structure and add more context if needed (e.g., link to BLS release page)
 
     return processed_events # Return list of data release events
 
-def init_database():
-    """Initializes the SQLite database and creates the events table."""
-    print(f"\nInitializing database: {DATABASE_FILE}")
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
-        # Create events table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                description TEXT,
-                value TEXT,
-                year TEXT,
-                period TEXT,
-                timestamp TEXT,
-                source TEXT,
-                series_id TEXT,
-                previous_value TEXT,
-                expected_value TEXT
-            );
-        """)
-
-        conn.commit()
-        print("Database initialized successfully.")
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+def create_revision_events(revisions):
+    """Creates "Revision" events for stored periods whose value BLS has changed."""
+    current_time = datetime.now().isoformat()
+    keys = [event_dedup.event_key(series_id, year, period, new_value)
+            for series_id, year, period, _, new_value in revisions]
+    new_keys = set(find_new_event_keys(keys))
+
+    events = []
+    for (series_id, year, period, old_value, new_value), key in zip(revisions, keys):
+        if key not in new_keys:
+            continue
+        description = f"{series_registry.series_name(series_id)} revised: Period = {year} {period}, {old_value} -> {new_value}"
+        try:
+            description += f", Revision = {float(new_value) - float(old_value):+.2f}"
+        except ValueError:
+            pass
+        events.append({
+            "type": "Revision",
+            "description": description,
+            "value": new_value,
+            "previous_value": old_value, # Value before the revision
+            "expected_value": "N/A",
+            "year": str(year),
+            "period": period,
+            "timestamp": current_time,
+            "source": "BLS API",
+            "series_id": series_id,
+            "severity": "unknown",
+        })
+        logger.info("Created REVISION Event: %s", description)
+    metrics.incr('events.created', len(events))
+    return events
+
+def process_changes(bls_data, changes):
+    """Creates "Data Release" events for newly published periods and "Revision" events for revised ones.
+
+    `changes` is the ChangeSet change_detector.detect() returned for bls_data.
+    """
+    events = []
+    if changes.releases:
+        released = [series for series in bls_data['Results']['series'] if series['seriesID'] in changes.releases]
+        events.extend(process_economic_data(extract_economic_data(
+            {'status': 'REQUEST_SUCCEEDED', 'Results': {'series': released}})))
+    if changes.revisions:
+        events.extend(create_revision_events(changes.revisions))
+    return events
+
+def init_database(warm_cache=True):
+    """Initializes the SQLite database (schema migrations, WAL) and optionally warms the dedup cache."""
+    if storage.init_database(DATABASE_FILE) and warm_cache:
+        event_dedup.load_known_keys()
+
+def _insert_events(conn, events):
+    """Inserts events inside the caller's transaction; returns the ones actually inserted.
+
+    The unique natural-key index makes a racing duplicate a no-op, and the rows
+    actually inserted are appended to the event log in the same transaction.
+    """
+    # Prepare data for insertion
+    data_to_insert = [
+        (event.get('type'), event.get('description'), event.get('value'),
+         event.get('year'), event.get('period'), event.get('timestamp'),
+         event.get('source'), event.get('series_id'),
+         event.get('previous_value'), event.get('expected_value'), # Include new fields
+         event.get('severity'))
+        for event in events
+    ]
+    inserted, inserted_ids = [], []
+    for event, row in zip(events, data_to_insert):
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO events (type, description, value, year, period, timestamp, source, series_id, previous_value, expected_value, severity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        """, row)
+        if cursor.rowcount:
+            inserted.append(event)
+            inserted_ids.append(cursor.lastrowid)
+    if inserted:
+        storage.bump_table_version(conn, 'events')
+    event_log.append(inserted, inserted_ids, conn=conn)
+    return inserted
+
+def _events_saved(conn, events, inserted):
+    """Bookkeeping once a transaction holding new events has committed."""
+    if inserted:
+        event_log.wakeup(conn)
+    event_dedup.mark_known(
+        event_dedup.event_key(e.get('series_id'), e.get('year'), e.get('period'), e.get('value'))
+        for e in events
+    )
+    metrics.incr('events.inserted', len(inserted))
 
 def save_events_to_database(events):
-    """Saves a list of events to the database."""
+    """Saves a list of events to the database; returns the events inserted, or None if the save failed."""
     if not events:
-        print("No events to save to database.")
-        return
+        logger.debug("No events to save to database.")
+        return []
 
-    print(f"\nSaving {len(events)} events to database: {DATABASE_FILE}")
-    conn = None
+    import leader_lease
+    logger.info("Saving %d events to database: %s", len(events), DATABASE_FILE)
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
-        # Prepare data for insertion
-        data_to_insert = [
-            (event.get('type'), event.get('description'), event.get('value'),
-             event.get('year'), event.get('period'), event.get('timestamp'),
-             event.get('source'), event.get('series_id'),
-             event.get('previous_value'), event.get('expected_value')) # Include new fields
-            for event in events
-        ]
-
-        # Insert data into the events table
-        cursor.executemany("""
-            INSERT INTO events (type, description, value, year, period, timestamp, source, series_id, previous_value, expected_value)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """, data_to_insert)
-
-        conn.commit()
-        print("Events saved to database successfully.")
-
+        # Insert the whole batch in one transaction
+        with storage.transaction() as conn:
+            if LEASE is not None:
+                LEASE.check_fence(conn)
+            inserted = _insert_events(conn, events)
+    except leader_lease.LeaseLost as e:
+        # Another instance took over; nothing was written. Polls go through persist_response, which fences the
+        # observation writes too, so the new leader still sees the data as new and saves these events itself.
+        metrics.incr('events.fenced')
+        logger.warning("Discarding %d event(s): %s", len(events), e)
+        return None
     except sqlite3.Error as e:
-        print(f"Database error while saving events: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Database error while saving events: %s", e)
+        return None
+    _events_saved(conn, events, inserted)
+    logger.info("Events saved to database successfully.")
+    return inserted
+
+def persist_response(bls_data):
+    """Stores a BLS response's changed observations and the events they produce in one transaction.
+
+    Returns the events inserted, or None when nothing was committed: on a
+    database error, or when this instance lost the lease (the fence is checked
+    before any write, so a deposed leader writes neither observations nor
+    events). Series hashes are recorded only after the commit, so a response
+    whose save failed is diffed again, and its events re-created, next time.
+    """
+    import leader_lease
+    try:
+        with storage.transaction() as conn:
+            if LEASE is not None:
+                LEASE.check_fence(conn)
+            # Store only the series whose observations changed, classifying each difference as a release or a revision
+            changes = change_detector.detect(bls_data, conn)
+            if not changes:
+                logger.info("No new or revised observations in the API response.")
+                events = inserted = []
+            else:
+                # Data Release events for new periods, Revision events for revised ones. Dedup lookups and
+                # analytics read this thread's connection, so they see the observations just stored.
+                events = process_changes(bls_data, changes)
+                inserted = _insert_events(conn, events)
+    except leader_lease.LeaseLost as e:
+        # Another instance took over mid-poll. The fence is checked before the observations are written, so
+        # nothing was, and the new leader finds the same data changed and saves its events itself
+        metrics.incr('events.fenced')
+        logger.warning("Discarding the BLS response: %s", e)
+        return None
+    except sqlite3.Error as e:
+        # Rolled back, hashes included, so the same response is processed again on the next poll
+        logger.error("Database error while storing the BLS response: %s", e)
+        return None
+    change_detector.remember(changes)
+    if events:
+        _events_saved(conn, events, inserted)
+        logger.info("Saved %d new event(s).", len(inserted))
+    return inserted
+
+def keep_warm(conn=None):
+    """Standby upkeep between skipped polls, so a takeover starts with warm caches.
+
+    Folds the events the active instance stored into the dedup set (by reading
+    the event log past the last offset seen) and loads the analytics module
+    once, so the first poll after a takeover pays for neither.
+    """
+    global _standby_offset
+    conn = conn or storage.get_connection()
+    try:
+        if _standby_offset is None:
+            import analytics  # noqa: F401  (the NumPy import is otherwise paid on the first new data)
+            _standby_offset = event_log.latest_offset(conn)
+        while True:
+            records = event_log.read(_standby_offset, conn=conn)
+            if not records:
+                break
+            event_dedup.mark_known(
+                event_dedup.event_key(r.event.get('series_id'), r.event.get('year'), r.event.get('period'), r.event.get('value'))
+                for r in records
+            )
+            _standby_offset = records[-1].offset
+    except sqlite3.Error as e:
+        logger.error("Database error while refreshing the standby caches: %s", e)
+
+def on_lease_acquired(lease):
+    """Prepares a new leader: forgets per-process state that may predate the previous leader's writes."""
+    # The previous leader stored observations this instance never hashed, so diff the next payloads in full
+    change_detector.reset()
+    http_client.forget()
+    keep_warm()
+    if INLINE_NOTIFY:
+        # Hand events the previous leader committed but never passed on to the notifier
+        import notifier
+        notifier.consume()
+
+def fetch_bls_data_planned(api_key, series_ids, start_year, end_year):
+    """Fetches any number of series as API-legal chunks run concurrently.
+
+    Returns (data, changed) like fetch_bls_data_if_changed; data holds only the
+    chunks whose response changed since the previous poll. With start_year=None
+    each series is requested only from its stored watermark onwards.
+    """
+    if start_year is None:
+        groups = observation_store.plan_start_years(series_ids, end_year)
+    else:
+        groups = {start_year: list(series_ids)}
+
+    responses = []
+    any_changed = False
+    for group_start, group_ids in sorted(groups.items()):
+        data, changed = fetch_planner.fetch_all(
+            lambda ids, start, end: fetch_bls_data_if_changed(api_key, ids, start, end),
+            group_ids, group_start, end_year, registered=bool(api_key),
+        )
+        any_changed = any_changed or changed
+        if data:
+            responses.append(data)
+
+    if not responses:
+        return None, any_changed
+    return (responses[0] if len(responses) == 1 else fetch_planner.merge_responses(responses)), True
+
+def backfill_observations(api_key, series_ids, years=fetch_planner.MAX_YEARS_PER_REQUEST):
+    """Loads up to `years` years of history per series into the observations table.
+
+    The range is split into API-sized windows by the fetch planner; only
+    observations that are new or changed are written. Each series is stored
+    as soon as it has been parsed from the response stream, so memory holds
+    one series per request in flight rather than the whole history.
+    """
+    end_year = datetime.now().year
+    start_year = end_year - years + 1
+    logger.info("Backfilling %d series from %d to %d...", len(series_ids), start_year, end_year)
+    changes = {}
+    changes_lock = threading.Lock()
+    received = 0
+
+    def store_chunk(ids, start, end):
+        nonlocal received
+        header = {}
+        try:
+            for series in stream_bls_series(api_key, ids, start, end, header):
+                if header.get('status') != 'REQUEST_SUCCEEDED':
+                    break
+                stored = observation_store.store_series([series])
+                with changes_lock:
+                    received += 1
+                    for series_id, change in stored.items():
+                        merged = changes.setdefault(series_id, {'new': [], 'changed': []})
+                        merged['new'].extend(change['new'])
+                        merged['changed'].extend(change['changed'])
+        except (requests.exceptions.RequestException, ValueError, sqlite3.Error) as e:
+            logger.error("Error backfilling %d series (%s-%s): %s", len(ids), start, end, e)
+            return None, True
+        if header.get('status') != 'REQUEST_SUCCEEDED':
+            logger.error("BLS API request for %d series (%s-%s) failed: %s", len(ids), start, end, header.get('message'))
+        # Nothing left to merge: the series were stored as they arrived
+        return None, True
+
+    fetch_planner.fetch_all(store_chunk, series_ids, start_year, end_year, registered=bool(api_key))
+    if not received:
+        logger.error("Backfill failed: no data returned from BLS API.")
+        return {}
+    new_count = sum(len(c['new']) for c in changes.values())
+    changed_count = sum(len(c['changed']) for c in changes.values())
+    logger.info("Backfill stored %d new and %d changed observation(s) for %d series.",
+                new_count, changed_count, len(changes))
+    return changes
+
+def poll_once(api_key, series_ids):
+    """Runs one fetch -> extract -> process -> save (-> notify) cycle and returns the new events."""
+    metrics.incr('poll.count')
+    with metrics.timer('poll.total_ms'):
+        return _poll_once(api_key, series_ids)
+
+def _poll_once(api_key, series_ids):
+    logger.info("--- Checking for new data at %s ---", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    # Fetch each series from its stored watermark (or the previous year if it has no history).
+    # We assume BLS API returns latest data first.
+    current_year = datetime.now().year
+    bls_data, changed = fetch_bls_data_planned(api_key, series_ids, None, current_year)
+
+    if not changed:
+        logger.info("BLS API response unchanged since last check. Skipping processing.")
+        return []
+    if not bls_data:
+        logger.error("Failed to fetch data from BLS API.")
+        http_client.discard_fingerprints()
+        return []
+
+    # Observations and the events they produce are committed together, or not at all
+    processed_events = persist_response(bls_data)
+    if processed_events is None:
+        # Nothing was saved: let the same responses through again on the next poll
+        http_client.discard_fingerprints()
+    else:
+        http_client.commit_fingerprints()
+
+    # Use the saved NEW events for notification
+    if processed_events:
+        # Deliver the new events appended to the event log by persist_response
+        if INLINE_NOTIFY:
+            import notifier
+            logger.info("--- Triggering Notifications for NEW Events ---")
+            notifier.consume()
+    elif processed_events is not None:
+        logger.info("No new events detected.")
+
+    return processed_events or []
 
 # 模擬定時抓取
 if __name__ == "__main__":
-    # Initialize the database on script start
-    init_database()
-
-    api_key = get_bls_api_key()
-    if not api_key:
-        print("BLS API key not available. Exiting.")
-        exit()
-
-    # Define the series IDs for Unemployment Rate, Nonfarm Payroll, CPI, and PPI
-    series_ids = [
-        'LNS14000000',  # Unemployment Rate
-        'CES0000000001',  # Nonfarm Payroll: Total Nonfarm
-        'CUUR0000SA0',  # CPI: All items, U.S. city average, unadjusted
-        'WPUID000000'  # PPI: All commodities, unadjusted
-    ]
-
-    # Monitoring loop
-    while True:
-        print(f"\n--- Checking for new data at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---")
-
-        # Fetch data for the current year. We assume BLS API returns latest data first.
-        current_year = datetime.now().year
-        # To get previous year's data for comparison, fetch data for current and previous year
-        bls_data = fetch_bls_data(api_key, series_ids, current_year - 1, current_year)
-
-        if bls_data:
-            extracted_data = extract_economic_data(bls_data)
-            if extracted_data:
-                # Process the extracted data and identify NEW events
-                # process_economic_data function now only creates events for new data
-                processed_events = process_economic_data(extracted_data)
-
-                # Use the identified NEW events for storage and notification
-                if processed_events:
-                    print(f"\nDetected {len(processed_events)} new event(s).")
-                    # Save new events to database
-                    save_events_to_database(processed_events)
-
-                    # Send notifications for new events
-                    print("\n--- Triggering Notifications for NEW Events ---")
-                    for event in processed_events:
-                        notification_service.send_notification(event)
-
-                else:
-                    print("No new events detected.")
-
-            else:
-                print("No data extracted successfully from API response.")
-        else:
-            print("Failed to fetch data from BLS API.")
-
-        # Wait for 5 minutes before next check...
-        print("\nWaiting for 1 minutes before next check...")
-        time.sleep(60) # Wait for 60 seconds (1 minute)
+    # Legacy entry point; collector_cli.py holds the implementation
+    import collector_cli
+
+    argv = [arg for arg in sys.argv[1:] if arg != '--backfill']
+    if '--backfill' in sys.argv:
+        # python data_collector.py --backfill [years]
+        position = sys.argv.index('--backfill')
+        years = sys.argv[position + 1:position + 2]
+        sys.exit(collector_cli.main(['backfill'] + (['--years'] + years if years else [])))
+    sys.exit(collector_cli.main(['daemon'] + argv))
 
     # Keep the placeholder for future HTML parsing if needed, but comment it out for now
     # html_content = """
@@ -0,0 +1,80 @@
+"""Dedup index for data release events.
+
+Keeps a warm in-memory set of the natural keys (series_id, year, period, value)
+already stored in the events table, so a poll only asks SQLite about keys it
+has not seen before, and does so with one query per batch instead of one
+connection per series.
+"""
+import logging
+import sqlite3
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# 4 parameters per key; stays under SQLite's default 999 host-parameter limit
+BATCH_SIZE = 200
+
+# Load every stored key on first use. Long-running processes want the warm set; a one-shot poll
+# is cheaper asking SQLite about just its candidate keys.
+PRELOAD_KNOWN_KEYS = True
+
+_known_keys = set()
+_loaded = False
+
+def event_key(series_id, year, period, value):
+    """Builds the natural key used by the unique index on the events table."""
+    return (series_id, str(year), period, str(value))
+
+def load_known_keys(conn=None):
+    """Loads every stored event key into the in-memory set (once per process)."""
+    global _loaded
+    conn = conn or storage.get_connection()
+    try:
+        cursor = conn.execute("SELECT series_id, year, period, value FROM events")
+        _known_keys.update(event_key(*row) for row in cursor)
+        _loaded = True
+    except sqlite3.Error as e:
+        logger.error("Database error while loading known event keys: %s", e)
+    return len(_known_keys)
+
+def mark_known(keys):
+    """Records keys that have just been written to the events table."""
+    _known_keys.update(keys)
+
+def reset():
+    """Clears the in-memory set, e.g. after the database file was replaced."""
+    global _loaded
+    _known_keys.clear()
+    _loaded = False
+
+def find_new_keys(keys, conn=None):
+    """Returns the subset of keys not yet stored, preserving input order.
+
+    Keys missing from the in-memory set are confirmed against the database in
+    batches, since another process may have written them since startup.
+    """
+    conn = conn or storage.get_connection()
+    if not _loaded and PRELOAD_KNOWN_KEYS:
+        load_known_keys(conn)
+
+    candidates = list(dict.fromkeys(k for k in keys if k not in _known_keys))
+    if not candidates:
+        return []
+
+    found = set()
+    try:
+        for start in range(0, len(candidates), BATCH_SIZE):
+            batch = candidates[start:start + BATCH_SIZE]
+            placeholders = ", ".join(["(?, ?, ?, ?)"] * len(batch))
+            params = [part for key in batch for part in key]
+            cursor = conn.execute(f"""
+                SELECT series_id, year, period, value FROM events
+                WHERE (series_id, year, period, value) IN (VALUES {placeholders});
+            """, params)
+            found.update(event_key(*row) for row in cursor)
+    except sqlite3.Error as e:
+        logger.error("Database error while checking for new events: %s", e)
+
+    _known_keys.update(found)
+    return [k for k in candidates if k not in found]
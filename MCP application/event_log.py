@@ -0,0 +1,217 @@
+"""Durable, append-only event log with consumer-group checkpoints.
+
+The collector appends every newly inserted event to the event_log table in
+the same transaction that saves it; offsets (log_offset) increase
+monotonically. Consumers (the notifier, and any archiver or analytics job
+added later) read the log independently: each consumer group keeps its own
+committed offset in event_log_consumers, so it resumes where it stopped after
+a crash and can be rewound with seek() to replay.
+
+A batch is handed to the consumer's handler inside the transaction that
+advances its checkpoint, so work the handler writes to the same database (e.g.
+outbox rows) is committed exactly once per record, even when several
+processes consume the same group.
+
+Waiting consumers are not polled on a fixed interval: each registers a
+localhost UDP port, and the producer sends a one-byte datagram to every
+registered port after committing new records. Datagrams are only a hint; a
+consumer also re-checks the log when WAKEUP_TIMEOUT passes without one.
+"""
+import json
+import logging
+import select
+import socket
+import sqlite3
+import threading
+import time
+
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TOPIC = 'events'
+CONSUME_BATCH_SIZE = 500
+WAKEUP_HOST = '127.0.0.1'
+WAKEUP_TIMEOUT = 1.0  # seconds a waiting consumer sleeps without a wakeup before re-checking
+RETENTION_SECONDS = 7 * 24 * 3600  # consumed records are kept this long for replay
+
+class LogRecord:
+    """One event read from the log."""
+    __slots__ = ('offset', 'event_id', 'topic', 'event', 'created_at')
+
+    def __init__(self, offset, event_id, topic, event, created_at):
+        self.offset = offset
+        self.event_id = event_id
+        self.topic = topic
+        self.event = event
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f"LogRecord({self.offset}, {self.topic}, event_id={self.event_id})"
+
+def append(events, event_ids=None, topic=EVENTS_TOPIC, conn=None):
+    """Appends events to the log; joins the caller's transaction. Returns the number appended."""
+    events = list(events)
+    if not events:
+        return 0
+    event_ids = list(event_ids) if event_ids is not None else [event.get('id') for event in events]
+    now = time.time()
+    rows = [
+        (event_id, topic, json.dumps(event, ensure_ascii=False, default=str), now)
+        for event_id, event in zip(event_ids, events)
+    ]
+    with storage.transaction(conn) as c:
+        c.executemany("""
+            INSERT INTO event_log (event_id, topic, payload, created_at) VALUES (?, ?, ?, ?);
+        """, rows)
+    metrics.incr('event_log.appended', len(rows))
+    return len(rows)
+
+def wakeup(conn=None):
+    """Nudges every waiting consumer; call after the appending transaction committed."""
+    conn = conn or storage.get_connection()
+    try:
+        ports = [row[0] for row in conn.execute(
+            "SELECT DISTINCT wakeup_port FROM event_log_consumers WHERE wakeup_port IS NOT NULL")]
+    except sqlite3.Error as e:
+        logger.error("Database error while reading consumer wakeup ports: %s", e)
+        return
+    if not ports:
+        return
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for port in ports:
+            try:
+                sock.sendto(b'1', (WAKEUP_HOST, port))
+            except OSError as e:
+                logger.debug("Could not wake consumer on port %d: %s", port, e)
+
+def latest_offset(conn=None):
+    """Offset of the newest record, or 0 when the log is empty."""
+    conn = conn or storage.get_connection()
+    return conn.execute("SELECT COALESCE(MAX(log_offset), 0) FROM event_log").fetchone()[0]
+
+def committed_offset(group, conn=None):
+    """Last offset the group has processed (0 for a new group, which starts from the beginning)."""
+    conn = conn or storage.get_connection()
+    row = conn.execute("SELECT committed_offset FROM event_log_consumers WHERE consumer_group = ?",
+                       (group,)).fetchone()
+    return row[0] if row else 0
+
+def _set_checkpoint(conn, group, offset):
+    conn.execute("""
+        INSERT INTO event_log_consumers (consumer_group, committed_offset, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (consumer_group) DO UPDATE SET
+            committed_offset = excluded.committed_offset, updated_at = excluded.updated_at;
+    """, (group, offset, time.time()))
+
+def seek(group, offset, conn=None):
+    """Moves a group's checkpoint so its next read starts after `offset` (0 replays everything kept)."""
+    with storage.transaction(conn) as c:
+        _set_checkpoint(c, group, offset)
+
+def drop_group(group, conn=None):
+    """Deletes a group's checkpoint, so a finished consumer no longer holds back prune()."""
+    with storage.transaction(conn) as c:
+        c.execute("DELETE FROM event_log_consumers WHERE consumer_group = ?", (group,))
+
+def read(after_offset, limit=CONSUME_BATCH_SIZE, conn=None):
+    """Returns up to `limit` records with offsets greater than `after_offset`."""
+    conn = conn or storage.get_connection()
+    rows = conn.execute("""
+        SELECT log_offset, event_id, topic, payload, created_at FROM event_log
+        WHERE log_offset > ? ORDER BY log_offset LIMIT ?;
+    """, (after_offset, limit))
+    return [LogRecord(offset, event_id, topic, json.loads(payload), created_at)
+            for offset, event_id, topic, payload, created_at in rows]
+
+def consume(group, handler, limit=CONSUME_BATCH_SIZE, conn=None):
+    """Runs handler(records, conn) on the group's next batch and commits its checkpoint.
+
+    Returns the number of records handled. If the handler raises, the
+    transaction rolls back and the batch is delivered again on the next call.
+    """
+    conn = conn or storage.get_connection()
+    # Cheap, lock-free check first so idle consumers never take the write lock
+    if latest_offset(conn) <= committed_offset(group, conn):
+        return 0
+    with storage.transaction(conn) as c:
+        records = read(committed_offset(group, c), limit, c)
+        if not records:
+            return 0
+        handler(records, c)
+        _set_checkpoint(c, group, records[-1].offset)
+    metrics.incr(f'event_log.consumed.{group}', len(records))
+    metrics.observe('event_log.consume_lag_ms', (time.time() - records[0].created_at) * 1000.0)
+    return len(records)
+
+def prune(retention=RETENTION_SECONDS, conn=None):
+    """Deletes records every consumer group has processed and that are older than `retention`."""
+    with storage.transaction(conn) as c:
+        cursor = c.execute("""
+            DELETE FROM event_log
+            WHERE created_at < ?
+              AND log_offset <= (SELECT COALESCE(MIN(committed_offset), 0) FROM event_log_consumers);
+        """, (time.time() - retention,))
+    return cursor.rowcount
+
+class WakeupListener:
+    """Localhost UDP socket a consumer group waits on; its port is registered in the database."""
+
+    def __init__(self, group, conn=None):
+        self.group = group
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((WAKEUP_HOST, 0))
+        self._sock.setblocking(False)
+        self.port = self._sock.getsockname()[1]
+        with storage.transaction(conn) as c:
+            c.execute("""
+                INSERT INTO event_log_consumers (consumer_group, wakeup_port, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (consumer_group) DO UPDATE SET
+                    wakeup_port = excluded.wakeup_port, updated_at = excluded.updated_at;
+            """, (group, self.port, time.time()))
+
+    def wait(self, timeout=WAKEUP_TIMEOUT):
+        """Blocks until a wakeup arrives or `timeout` passes; returns whether one arrived."""
+        ready, _, _ = select.select([self._sock], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                self._sock.recv(64)
+            except BlockingIOError:
+                return True
+
+    def close(self, conn=None):
+        try:
+            with storage.transaction(conn) as c:
+                c.execute("UPDATE event_log_consumers SET wakeup_port = NULL WHERE consumer_group = ? AND wakeup_port = ?",
+                          (self.group, self.port))
+        except sqlite3.Error as e:
+            logger.debug("Could not unregister wakeup port for %s: %s", self.group, e)
+        self._sock.close()
+
+def tail(group, handler, stop_event=None, after_batch=None, limit=CONSUME_BATCH_SIZE, timeout=WAKEUP_TIMEOUT):
+    """Consumes the log for `group` until stop_event is set, waiting on wakeups when caught up.
+
+    `after_batch(count)` runs after each committed batch, outside the transaction.
+    """
+    stop_event = stop_event or threading.Event()
+    listener = WakeupListener(group)
+    logger.info("Tailing event log as '%s' from offset %d (wakeup port %d)",
+                group, committed_offset(group), listener.port)
+    try:
+        while not stop_event.is_set():
+            try:
+                count = consume(group, handler, limit)
+            except Exception as e:
+                # The batch was rolled back; retry it after the usual wait instead of spinning
+                logger.exception("Error while consuming the event log as '%s': %s", group, e)
+                count = 0
+            if count:
+                if after_batch:
+                    after_batch(count)
+                continue
+            listener.wait(timeout)
+    finally:
+        listener.close()
@@ -0,0 +1,134 @@
+"""Splits BLS API fetches into API-legal requests and runs them concurrently.
+
+The BLS v2 API caps the number of series and the span of years per request,
+and limits how many requests a key may make per day. The planner chunks a
+series list and year range to fit those limits, spends the daily quota from a
+budget kept in the database, runs the chunks with a bounded number in flight,
+and merges the responses back into the single-response shape that
+extract_economic_data expects.
+"""
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+# BLS v2 limits with a registration key (and without one)
+MAX_SERIES_PER_REQUEST = 50
+MAX_YEARS_PER_REQUEST = 20
+DAILY_QUERY_LIMIT = 500
+UNREGISTERED_MAX_SERIES_PER_REQUEST = 25
+UNREGISTERED_MAX_YEARS_PER_REQUEST = 10
+UNREGISTERED_DAILY_QUERY_LIMIT = 25
+
+MAX_IN_FLIGHT = 4  # concurrent API requests per poll
+QUOTA_TIMEZONE = ZoneInfo('America/New_York')
+
+def plan_requests(series_ids, start_year, end_year, registered=True):
+    """Returns [(series_chunk, start_year, end_year)] covering every series and year.
+
+    Newer year windows come first, so a merged series stays newest-first.
+    """
+    max_series = MAX_SERIES_PER_REQUEST if registered else UNREGISTERED_MAX_SERIES_PER_REQUEST
+    max_years = MAX_YEARS_PER_REQUEST if registered else UNREGISTERED_MAX_YEARS_PER_REQUEST
+    series_ids = list(dict.fromkeys(series_ids))
+    start_year, end_year = int(start_year), int(end_year)
+
+    windows = []
+    window_end = end_year
+    while window_end >= start_year:
+        window_start = max(start_year, window_end - max_years + 1)
+        windows.append((window_start, window_end))
+        window_end = window_start - 1
+
+    return [
+        (series_ids[i:i + max_series], window_start, window_end)
+        for window_start, window_end in windows
+        for i in range(0, len(series_ids), max_series)
+    ]
+
+def reserve_quota(requested, registered=True):
+    """Reserves up to `requested` API queries from today's budget and returns how many were granted."""
+    limit = DAILY_QUERY_LIMIT if registered else UNREGISTERED_DAILY_QUERY_LIMIT
+    today = datetime.now(QUOTA_TIMEZONE).date().isoformat()
+    try:
+        with storage.transaction() as conn:
+            row = conn.execute("SELECT used FROM api_quota WHERE day = ?", (today,)).fetchone()
+            used = row[0] if row else 0
+            granted = max(0, min(requested, limit - used))
+            conn.execute("""
+                INSERT INTO api_quota (day, used) VALUES (?, ?)
+                ON CONFLICT(day) DO UPDATE SET used = used + excluded.used
+            """, (today, granted))
+    except sqlite3.Error as e:
+        logger.error("Database error while reserving API quota: %s", e)
+        return requested
+    metrics.set_gauge('api.quota_used', used + granted)
+    metrics.set_gauge('api.quota_limit', limit)
+    if granted < requested:
+        metrics.incr('api.quota_denied', requested - granted)
+    return granted
+
+def merge_responses(responses):
+    """Merges BLS responses into one, concatenating data for series split across year windows."""
+    merged_series = {}
+    messages = []
+    for data in responses:
+        messages.extend(data.get('message', []))
+        for series in data.get('Results', {}).get('series', []):
+            existing = merged_series.get(series['seriesID'])
+            if existing is None:
+                merged_series[series['seriesID']] = {'seriesID': series['seriesID'], 'data': list(series.get('data', []))}
+            else:
+                existing['data'].extend(series.get('data', []))
+    return {
+        'status': 'REQUEST_SUCCEEDED',
+        'message': messages,
+        'Results': {'series': list(merged_series.values())},
+    }
+
+def fetch_all(fetch_chunk, series_ids, start_year, end_year, registered=True, max_in_flight=MAX_IN_FLIGHT):
+    """Fetches every planned chunk with at most `max_in_flight` requests at once.
+
+    `fetch_chunk(series_ids, start_year, end_year)` returns (data, changed), as
+    data_collector.fetch_bls_data_if_changed does. Returns (merged_data, changed):
+    merged_data holds only the chunks that changed, and is None when none did
+    or every request failed.
+    """
+    plan = plan_requests(series_ids, start_year, end_year, registered)
+    if not plan:
+        return None, False
+
+    granted = reserve_quota(len(plan), registered)
+    if granted < len(plan):
+        logger.warning("Daily BLS API quota nearly exhausted: running %d of %d planned requests.", granted, len(plan))
+        plan = plan[:granted]
+        if not plan:
+            return None, True
+
+    if len(plan) == 1:
+        results = [fetch_chunk(*plan[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_in_flight, len(plan))) as pool:
+            results = list(pool.map(lambda chunk: fetch_chunk(*chunk), plan))
+
+    responses = []
+    any_changed = False
+    for (chunk_ids, chunk_start, chunk_end), (data, changed) in zip(plan, results):
+        any_changed = any_changed or changed
+        if not changed or not data:
+            continue
+        if data.get('status') != 'REQUEST_SUCCEEDED':
+            logger.error("BLS API request for %d series (%s-%s) failed: %s",
+                         len(chunk_ids), chunk_start, chunk_end, data.get('message'))
+            continue
+        responses.append(data)
+
+    if not responses:
+        return None, any_changed
+    return merge_responses(responses), True
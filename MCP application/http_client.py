@@ -0,0 +1,159 @@
+"""Shared HTTP layer for BLS API calls and release-page fetches.
+
+One keep-alive session is reused across polls so a poll does not pay a new
+TCP/TLS handshake. Requests get timeouts and a bounded number of retries with
+jittered exponential backoff. GETs can be made conditional (ETag /
+Last-Modified), and response bodies can be fingerprinted so callers can skip
+work when nothing changed since the previous poll. A new fingerprint is only
+staged until the caller commits it, once the body has been processed; a body
+whose processing failed is therefore treated as changed again next time.
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 30  # seconds
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 8.0  # seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+POOL_MAXSIZE = 16
+
+# Fields that change on every BLS API response even when the data does not
+_VOLATILE_FIELDS = re.compile(rb'"responseTime"\s*:\s*\d+\s*,?')
+
+_session = None
+_session_lock = threading.Lock()
+_validators = {}  # url -> {'etag': ..., 'last_modified': ...}
+_fingerprints = {}  # caller-chosen key -> sha256 hex digest of the last body processed
+_staged = {}  # caller-chosen key -> digest of a body seen but not yet committed
+
+def get_session():
+    """Returns the process-wide keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def _retry_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_CAP)
+            except ValueError:
+                pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+def request(method, url, retries=MAX_RETRIES, timeout=None, before_retry=None, **kwargs):
+    """Sends a request on the shared session, retrying transient failures.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    `retries` times. The final response is returned as-is (the caller decides
+    whether to raise_for_status); the final network error is re-raised.
+    `before_retry()` is called before each retry and can veto it by returning
+    False (e.g. when the retry would exceed an API quota); the failure at hand
+    is then final.
+    """
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    session = get_session()
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            metrics.incr('http.errors')
+            if attempt == retries or (before_retry is not None and not before_retry()):
+                raise
+            delay = _retry_delay(attempt)
+            metrics.incr('http.retries')
+            logger.warning("Request to %s failed (%s); retrying in %.2fs (%d/%d)", url, e, delay, attempt + 1, retries)
+            time.sleep(delay)
+            continue
+        metrics.observe('http.request_ms', (time.perf_counter() - started) * 1000.0)
+        metrics.incr(f'http.status.{response.status_code}')
+
+        if (response.status_code in RETRY_STATUS_CODES and attempt < retries
+                and (before_retry is None or before_retry())):
+            delay = _retry_delay(attempt, response)
+            metrics.incr('http.retries')
+            logger.warning("Request to %s returned %d; retrying in %.2fs (%d/%d)",
+                           url, response.status_code, delay, attempt + 1, retries)
+            response.close()
+            time.sleep(delay)
+            continue
+        return response
+
+def conditional_get(url, headers=None, **kwargs):
+    """GETs a URL with If-None-Match / If-Modified-Since from the previous response.
+
+    A 304 response means the resource is unchanged since the last 200.
+    """
+    headers = dict(headers or {})
+    validators = _validators.get(url, {})
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    response = request('GET', url, headers=headers, **kwargs)
+    if response.status_code == 200:
+        _validators[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+    return response
+
+def content_fingerprint(content):
+    """Hashes a response body, ignoring fields that change on every response."""
+    return hashlib.sha256(_VOLATILE_FIELDS.sub(b'', content)).hexdigest()
+
+def is_unchanged(key, content):
+    """Returns True if `content` matches the last committed body for `key`; otherwise stages its fingerprint."""
+    fingerprint = content_fingerprint(content)
+    if _fingerprints.get(key) == fingerprint:
+        return True
+    _staged[key] = fingerprint
+    return False
+
+def commit_fingerprints(keys=None):
+    """Records the staged fingerprints of `keys` (default: all) once their bodies have been processed."""
+    for key in list(_staged) if keys is None else keys:
+        fingerprint = _staged.pop(key, None)
+        if fingerprint is not None:
+            _fingerprints[key] = fingerprint
+
+def discard_fingerprints(keys=None):
+    """Drops staged fingerprints of `keys` (default: all), so those bodies count as changed next time."""
+    if keys is None:
+        _staged.clear()
+    else:
+        for key in keys:
+            _staged.pop(key, None)
+
+def forget(key=None):
+    """Drops remembered fingerprints so the next response is treated as changed."""
+    if key is None:
+        _fingerprints.clear()
+        _staged.clear()
+    else:
+        _fingerprints.pop(key, None)
+        _staged.pop(key, None)
@@ -0,0 +1,196 @@
+"""Leader election for redundant collector instances, via a lease in the shared SQLite file.
+
+Any number of collectors can run against the same database. One at a time
+holds the lease (a row in the leases table) and polls the BLS API; the
+others are warm standbys that run the same release calendar but skip the
+requests, so API quota is spent once.
+
+* The leader renews the lease every HEARTBEAT_INTERVAL. It treats itself as
+  leader only until LEASE_TTL minus a safety margin after the last renewal
+  started, so it steps down before anyone else can take over.
+* A standby checks every STANDBY_CHECK_INTERVAL. It takes the lease once it
+  has expired, or at once when the leader released it on shutdown.
+* on_acquire/on_lose callbacks run in order on a separate thread, so slow
+  takeover work (warming caches, delivering webhooks) never delays a renewal.
+* Every takeover increments the lease's epoch, a fencing token. Writes that
+  must come from the leader call check_fence() inside their transaction. A
+  deposed leader whose epoch is stale then raises LeaseLost and rolls back.
+  This stays safe even if the leader was paused past its lease (GC, suspend,
+  a slow disk), because SQLite serializes the fence check with the writes.
+
+Events are deduplicated at insert time regardless (the unique natural-key
+index), and only rows actually inserted reach the event log and the
+notifier. So even two instances that both believe they lead cannot send
+the same alert twice.
+"""
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE = 'collector'
+LEASE_TTL = 10.0  # seconds a lease stays valid without renewal
+HEARTBEAT_INTERVAL = 2.5  # seconds between renewals by the leader
+STANDBY_CHECK_INTERVAL = 1.0  # seconds between takeover attempts by a standby
+SAFETY_MARGIN = 1.0  # seconds before expiry at which the leader stops acting as one
+
+class LeaseLost(Exception):
+    """Raised inside a write transaction when this instance no longer holds the lease."""
+
+class Lease:
+    """One instance's view of a named lease."""
+
+    def __init__(self, name=DEFAULT_LEASE, holder=None, ttl=LEASE_TTL):
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.epoch = None  # fencing token while held
+        self._valid_until = 0.0  # time.monotonic() deadline for acting as leader
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self.epoch is not None and time.monotonic() < self._valid_until
+
+    def try_acquire(self, conn=None):
+        """Takes the lease if it is free, expired or already ours; returns whether we hold it."""
+        started = time.monotonic()
+        now = time.time()
+        with self._lock, storage.transaction(conn) as c:
+            row = c.execute("SELECT holder, epoch, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            if row and row[0] != self.holder and row[2] > now:
+                self.epoch = None
+                return False
+            if row and row[0] == self.holder and row[1] == self.epoch:
+                epoch = self.epoch  # still ours: a plain renewal
+            else:
+                epoch = (row[1] if row else 0) + 1
+            c.execute("""
+                INSERT INTO leases (name, holder, epoch, expires_at, renewed_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    holder = excluded.holder, epoch = excluded.epoch,
+                    expires_at = excluded.expires_at, renewed_at = excluded.renewed_at;
+            """, (self.name, self.holder, epoch, now + self.ttl, now))
+            self.epoch = epoch
+            self._valid_until = started + self.ttl - SAFETY_MARGIN
+        return True
+
+    def renew(self, conn=None):
+        """Extends a held lease; returns False (and steps down) if another instance took it."""
+        if self.epoch is None:
+            return False
+        started = time.monotonic()
+        now = time.time()
+        with self._lock, storage.transaction(conn) as c:
+            cursor = c.execute("""
+                UPDATE leases SET expires_at = ?, renewed_at = ? WHERE name = ? AND holder = ? AND epoch = ?;
+            """, (now + self.ttl, now, self.name, self.holder, self.epoch))
+            if cursor.rowcount:
+                self._valid_until = started + self.ttl - SAFETY_MARGIN
+                return True
+            self.epoch = None
+            return False
+
+    def release(self, conn=None):
+        """Gives the lease up so a standby can take over at its next check instead of waiting for expiry."""
+        if self.epoch is None:
+            return
+        try:
+            with self._lock, storage.transaction(conn) as c:
+                c.execute("UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ? AND epoch = ?",
+                          (self.name, self.holder, self.epoch))
+        except sqlite3.Error as e:
+            logger.warning("Could not release lease '%s': %s", self.name, e)
+        self.epoch = None
+        metrics.set_gauge(f'lease.{self.name}.leader', 0)
+
+    def check_fence(self, conn):
+        """Raises LeaseLost unless this instance's epoch is current; call inside the write transaction."""
+        epoch = self.epoch
+        if epoch is None or not conn.execute(
+                "SELECT 1 FROM leases WHERE name = ? AND holder = ? AND epoch = ?",
+                (self.name, self.holder, epoch)).fetchone():
+            raise LeaseLost(f"lease '{self.name}' is no longer held by {self.holder}")
+
+    def _run_callbacks(self, callbacks):
+        """Runs queued on_acquire/on_lose callbacks in order until the None sentinel."""
+        while True:
+            callback = callbacks.get()
+            if callback is None:
+                return
+            try:
+                callback(self)
+            except Exception as e:
+                logger.exception("Lease '%s' callback %s failed: %s", self.name, getattr(callback, '__name__', callback), e)
+
+    def run(self, stop_event=None, on_acquire=None, on_lose=None):
+        """Heartbeat loop: renews while leading, tries to take over while standing by.
+
+        The callbacks are handed to a worker thread; the loop itself only
+        touches the lease row.
+        """
+        stop_event = stop_event or threading.Event()
+        leading = False
+        callbacks = queue.Queue()
+        worker = threading.Thread(target=self._run_callbacks, args=(callbacks,),
+                                  name=f'lease-{self.name}-callbacks', daemon=True)
+        worker.start()
+        try:
+            while not stop_event.is_set():
+                try:
+                    held = self.renew() if leading else self.try_acquire()
+                except sqlite3.Error as e:
+                    # A busy or unavailable database: keep leading only while the local deadline allows
+                    logger.warning("Lease '%s' heartbeat failed: %s", self.name, e)
+                    held = self.is_leader
+                if held and not leading:
+                    logger.info("Acquired lease '%s' as %s (epoch %d)", self.name, self.holder, self.epoch)
+                    metrics.incr(f'lease.{self.name}.acquired')
+                    if on_acquire:
+                        callbacks.put(on_acquire)
+                elif leading and not held:
+                    logger.warning("Lost lease '%s'; continuing as standby", self.name)
+                    metrics.incr(f'lease.{self.name}.lost')
+                    if on_lose:
+                        callbacks.put(on_lose)
+                leading = held
+                metrics.set_gauge(f'lease.{self.name}.leader', 1 if held else 0)
+                stop_event.wait(HEARTBEAT_INTERVAL if leading else STANDBY_CHECK_INTERVAL)
+        finally:
+            callbacks.put(None)
+            self.release()
+
+    def start(self, stop_event=None, on_acquire=None, on_lose=None):
+        """Runs the heartbeat loop on a daemon thread; returns the thread."""
+        thread = threading.Thread(target=self.run, args=(stop_event, on_acquire, on_lose),
+                                  name=f'lease-{self.name}', daemon=True)
+        thread.start()
+        return thread
+
+    def wait_until_leader(self, timeout=None):
+        """Blocks until this instance leads (True) or `timeout` passes (False)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.is_leader:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+def guarded(poll, lease, standby=None):
+    """Wraps `poll(series_ids)` so it runs only while `lease` is held; standbys run `standby()` instead."""
+    def guarded_poll(series_ids):
+        if lease.is_leader:
+            return poll(series_ids)
+        if standby:
+            standby()
+        return []
+    return guarded_poll
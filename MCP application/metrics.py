@@ -0,0 +1,204 @@
+"""In-process counters, gauges and latency histograms for the collector.
+
+Every stage of a poll records into one module-level registry:
+
+* counters (``incr``): requests, retries, 304s, events created, notifications sent, ...
+* gauges (``set_gauge``): e.g. API quota used today
+* histograms (``observe`` / ``timer``): stage durations in milliseconds, kept in
+  fixed log-spaced buckets so recording is a bisect and an increment, with
+  count/sum/min/max alongside
+
+* sections (``register_section``): structured reports computed by their owning
+  module when a snapshot is taken, e.g. the notification dispatcher's
+  per-destination throughput and latency under ``notify.destinations``
+
+``snapshot()`` returns everything as a JSON-ready dict. It can be exported by
+``start_http_server`` (GET /metrics on localhost) or ``start_snapshot_writer``
+(a JSON file rewritten periodically). Set METRICS_ENABLED=0 to turn recording
+into a no-op.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_HOST = '127.0.0.1'
+SNAPSHOT_INTERVAL = 60  # seconds between snapshot file rewrites
+
+# Histogram bucket upper bounds in milliseconds: 0.05 ms .. ~100 s, four per doubling
+BUCKET_BOUNDS = tuple(0.05 * 2 ** (i / 4) for i in range(85))
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_sections = {}  # name -> provider() returning a JSON-ready dict
+_started = time.time()
+
+class Histogram:
+    """Bucketed distribution of observed values (milliseconds for timers)."""
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        def rounded(value):
+            return None if value is None else round(value, 3)
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'min': rounded(self.min),
+            'max': rounded(self.max),
+            'p50': rounded(self.percentile(0.50)),
+            'p95': rounded(self.percentile(0.95)),
+            'p99': rounded(self.percentile(0.99)),
+        }
+
+def incr(name, value=1):
+    """Adds `value` to a counter."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def set_gauge(name, value):
+    """Sets a gauge to its current value."""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+def observe(name, value):
+    """Records one value in a histogram."""
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value)
+
+@contextmanager
+def timer(name):
+    """Times the enclosed block into histogram `name`, in milliseconds."""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - started) * 1000.0)
+
+def register_section(name, provider):
+    """Adds `provider()`'s result to every snapshot under snapshot()['sections'][name]."""
+    with _lock:
+        _sections[name] = provider
+
+def snapshot():
+    """Returns all metrics as a JSON-serializable dict."""
+    with _lock:
+        result = {
+            'timestamp': time.time(),
+            'uptime_s': round(time.time() - _started, 3),
+            'counters': dict(_counters),
+            'gauges': dict(_gauges),
+            'histograms': {name: h.summary() for name, h in _histograms.items()},
+        }
+        providers = list(_sections.items())
+    # Providers take their own locks, so they run outside the registry lock
+    sections = {}
+    for name, provider in providers:
+        try:
+            sections[name] = provider()
+        except Exception as e:
+            logger.error("Metrics section %s failed: %s", name, e)
+    result['sections'] = sections
+    return result
+
+def reset():
+    """Clears every metric (used by benchmarks between phases)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+def write_snapshot(path):
+    """Atomically writes the current snapshot to `path` as JSON."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+def start_snapshot_writer(path, interval=SNAPSHOT_INTERVAL, stop_event=None):
+    """Rewrites the snapshot file every `interval` seconds on a daemon thread."""
+    stop_event = stop_event or threading.Event()
+
+    def loop():
+        while not stop_event.wait(interval):
+            try:
+                write_snapshot(path)
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot '%s': %s", path, e)
+
+    threading.Thread(target=loop, name='metrics-snapshot', daemon=True).start()
+    return stop_event
+
+def start_http_server(port, host=METRICS_HOST):
+    """Serves GET /metrics (JSON snapshot) on a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # only daemons export over HTTP
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = json.dumps(snapshot(), sort_keys=True).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+    return server
@@ -0,0 +1,295 @@
+"""Batched, rate-limit-aware notification dispatcher backed by a SQLite outbox.
+
+New events are appended to the event log in the same transaction that saves
+them; the notifier (notifier.py) consumes the log and enqueues each batch into
+the notification_outbox table in the same transaction that advances its
+checkpoint, so an alert is never lost when a post fails or the process
+crashes. The dispatcher claims due rows, packs up to the webhook's
+per-message embed limit into each post, follows Discord's rate-limit headers
+(X-RateLimit-Remaining / X-RateLimit-Reset-After, and Retry-After on 429), and
+reschedules failed rows with exponential backoff. Throughput and delivery
+latency are tracked per destination (get_stats()) and reported in every
+metrics snapshot under sections['notify.destinations'].
+
+Events are routed to destinations by the subscription registry
+(subscriptions.py). Each destination's messages are posted in order, but
+destinations are served concurrently, so one slow or rate-limited webhook does
+not hold up the others.
+"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+import http_client
+import metrics
+import notification_service
+import storage
+import subscriptions
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord webhook limit
+MAX_EMBED_CHARS_PER_MESSAGE = 6000  # Discord limit on total embed text per message
+CLAIM_BATCH_SIZE = 500
+CLAIM_TIMEOUT = 60  # seconds a claimed row stays hidden from other dispatchers
+MAX_INLINE_WAIT = 5.0  # wait out rate limits shorter than this instead of rescheduling
+MAX_ATTEMPTS = 8
+RETRY_BASE = 2.0  # seconds
+RETRY_CAP = 300.0  # seconds
+LATENCY_SAMPLES = 1000
+MAX_CONCURRENT_DESTINATIONS = 8  # destinations posted to at once
+
+_blocked_until = {}  # destination -> epoch seconds before which we must not post
+_stats = {}
+_stats_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def enqueue(events, destination=None, conn=None):
+    """Adds one outbox row per event and matching destination; joins the caller's transaction.
+
+    Without an explicit destination, events are routed through the subscription
+    registry. Each event's embed is built once, however many destinations get it.
+    """
+    events = list(events)
+    if not events:
+        return 0
+    routes = [(destination, events)] if destination else subscriptions.route(events, conn)
+    now = time.time()
+    payloads = {}
+    rows = []
+    for route_destination, route_events in routes:
+        for event in route_events:
+            payload = payloads.get(id(event))
+            if payload is None:
+                payload = payloads[id(event)] = json.dumps(notification_service.build_embed(event), ensure_ascii=False)
+            rows.append((route_destination, payload, now, now))
+    if not rows:
+        return 0
+    with storage.transaction(conn) as c:
+        c.executemany("""
+            INSERT INTO notification_outbox (destination, payload, created_at, next_attempt_at)
+            VALUES (?, ?, ?, ?);
+        """, rows)
+    return len(rows)
+
+def _claim_due(limit):
+    """Claims due rows atomically so concurrent dispatchers never post the same row."""
+    now = time.time()
+    with storage.transaction() as conn:
+        rows = conn.execute("""
+            SELECT id, destination, payload, created_at, attempts FROM notification_outbox
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY id LIMIT ?;
+        """, (now, limit)).fetchall()
+        if rows:
+            conn.executemany("UPDATE notification_outbox SET next_attempt_at = ? WHERE id = ?",
+                             [(now + CLAIM_TIMEOUT, row[0]) for row in rows])
+    return rows
+
+def _embed_chars(embed):
+    """Counts the embed text Discord includes in its per-message character limit."""
+    total = len(embed.get('title', '')) + len(embed.get('description', ''))
+    for field in embed.get('fields', []):
+        total += len(str(field.get('name', ''))) + len(str(field.get('value', '')))
+    return total
+
+def pack_messages(rows):
+    """Groups claimed rows into messages of at most MAX_EMBEDS_PER_MESSAGE embeds."""
+    messages = []
+    current, chars = [], 0
+    for row in rows:
+        embed = json.loads(row[2])
+        size = _embed_chars(embed)
+        if current and (len(current) == MAX_EMBEDS_PER_MESSAGE or chars + size > MAX_EMBED_CHARS_PER_MESSAGE):
+            messages.append(current)
+            current, chars = [], 0
+        current.append((row, embed))
+        chars += size
+    if current:
+        messages.append(current)
+    return messages
+
+def _retry_after_seconds(response):
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is None:
+        try:
+            retry_after = response.json().get('retry_after')
+        except ValueError:
+            retry_after = None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return 1.0
+
+def _update_rate_limit(destination, response):
+    """Records when the destination may be posted to again, from Discord's headers."""
+    if response.status_code == 429:
+        _blocked_until[destination] = time.time() + _retry_after_seconds(response)
+        return
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset_after = response.headers.get('X-RateLimit-Reset-After')
+    if remaining == '0' and reset_after:
+        try:
+            _blocked_until[destination] = time.time() + float(reset_after)
+        except ValueError:
+            pass
+
+def _mark_sent(ids):
+    now = time.time()
+    with storage.transaction() as conn:
+        conn.executemany("UPDATE notification_outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                         [(now, i) for i in ids])
+    return now
+
+def _reschedule(rows, error, next_attempt_at=None, count_attempt=True):
+    """Puts rows back as pending; failed attempts back off exponentially until MAX_ATTEMPTS."""
+    updates = []
+    for row in rows:
+        attempts = row[4] + (1 if count_attempt else 0)
+        if count_attempt and attempts >= MAX_ATTEMPTS:
+            status, when = 'dead', time.time()
+        else:
+            status = 'pending'
+            when = next_attempt_at or time.time() + random.uniform(0.5, 1.0) * min(RETRY_CAP, RETRY_BASE * (2 ** attempts))
+        updates.append((status, attempts, when, error, row[0]))
+    with storage.transaction() as conn:
+        conn.executemany("""
+            UPDATE notification_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?
+            WHERE id = ?;
+        """, updates)
+
+def _record(destination, **changes):
+    with _stats_lock:
+        stats = _stats.setdefault(destination, {
+            'messages': 0, 'embeds': 0, 'failures': 0, 'rate_limited': 0,
+            'send_seconds': 0.0, 'latencies': deque(maxlen=LATENCY_SAMPLES),
+        })
+        for key, value in changes.items():
+            if key == 'latencies':
+                stats['latencies'].extend(value)
+            else:
+                stats[key] += value
+    for key, value in changes.items():
+        if key == 'latencies':
+            for latency in value:
+                metrics.observe('notify.delivery_latency_ms', latency * 1000.0)
+        elif key == 'send_seconds':
+            metrics.observe('notify.send_ms', value * 1000.0)
+        else:
+            metrics.incr(f'notify.{key}', value)
+
+def _send_message(destination, message):
+    """Posts one packed message; returns the number of embeds delivered."""
+    rows = [row for row, _ in message]
+    wait = _blocked_until.get(destination, 0) - time.time()
+    if wait > 0:
+        if wait > MAX_INLINE_WAIT:
+            _reschedule(rows, 'rate limited', next_attempt_at=_blocked_until[destination], count_attempt=False)
+            return 0
+        time.sleep(wait)
+
+    started = time.perf_counter()
+    try:
+        response = http_client.request('POST', destination, json={"embeds": [embed for _, embed in message]}, retries=0)
+    except requests.exceptions.RequestException as e:
+        _record(destination, failures=1, send_seconds=time.perf_counter() - started)
+        _reschedule(rows, str(e))
+        logger.error("Error sending %d notification(s) to %s: %s", len(rows), redact(destination), e)
+        return 0
+    elapsed = time.perf_counter() - started
+    _update_rate_limit(destination, response)
+
+    if response.status_code == 429:
+        _record(destination, rate_limited=1, send_seconds=elapsed)
+        _reschedule(rows, 'rate limited (429)', next_attempt_at=_blocked_until[destination], count_attempt=False)
+        logger.warning("Rate limited by %s; retrying %d notification(s) later.", redact(destination), len(rows))
+        return 0
+    if not response.ok:
+        _record(destination, failures=1, send_seconds=elapsed)
+        _reschedule(rows, f"HTTP {response.status_code}: {response.text[:200]}")
+        logger.error("Error sending %d notification(s) to %s: HTTP %d", len(rows), redact(destination), response.status_code)
+        return 0
+
+    sent_at = _mark_sent([row[0] for row in rows])
+    _record(destination, messages=1, embeds=len(rows), send_seconds=elapsed,
+            latencies=[sent_at - row[3] for row in rows])
+    return len(rows)
+
+def dispatch_pending(limit=CLAIM_BATCH_SIZE):
+    """Delivers every due outbox row once; returns the number of notifications sent."""
+    try:
+        rows = _claim_due(limit)
+    except sqlite3.Error as e:
+        logger.error("Database error while claiming notifications: %s", e)
+        return 0
+    if not rows:
+        return 0
+
+    by_destination = {}
+    for row in rows:
+        by_destination.setdefault(row[1], []).append(row)
+
+    if len(by_destination) == 1:
+        sent = _deliver(*next(iter(by_destination.items())))
+    else:
+        sent = sum(_get_pool().map(lambda item: _deliver(*item), by_destination.items()))
+    if sent:
+        logger.info("Delivered %d notification(s) in %d claimed.", sent, len(rows))
+    return sent
+
+def _deliver(destination, rows):
+    """Posts one destination's claimed rows in order; returns the number delivered."""
+    return sum(_send_message(destination, message) for message in pack_messages(rows))
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DESTINATIONS, thread_name_prefix='notify')
+    return _pool
+
+def run_dispatcher(stop_event=None, interval=1.0):
+    """Keeps dispatching until stop_event is set, sleeping `interval` when the outbox is idle."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        if not dispatch_pending():
+            stop_event.wait(interval)
+
+def redact(destination):
+    """Hides the webhook token when a destination URL is printed or reported."""
+    parts = urlsplit(destination)
+    path = parts.path.rsplit('/', 1)[0] if '/webhooks/' in parts.path else parts.path
+    return f"{parts.netloc}{path}"
+
+def get_stats():
+    """Per-destination delivery counts, throughput (embeds/s of send time) and latency (s)."""
+    report = {}
+    with _stats_lock:
+        for destination, stats in _stats.items():
+            latencies = sorted(stats['latencies'])
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+            report[redact(destination)] = {
+                'messages': stats['messages'],
+                'embeds': stats['embeds'],
+                'failures': stats['failures'],
+                'rate_limited': stats['rate_limited'],
+                'throughput_per_s': stats['embeds'] / stats['send_seconds'] if stats['send_seconds'] else None,
+                'latency_p50_s': pct(0.50),
+                'latency_p95_s': pct(0.95),
+                'latency_max_s': latencies[-1] if latencies else None,
+            }
+    return report
+
+# Per-destination numbers appear in every metrics snapshot (/metrics, --metrics-file)
+metrics.register_section('notify.destinations', get_stats)
@@ -1,24 +1,40 @@
 import sqlite3
 import json
+import logging
 from datetime import datetime
+import os
 import requests # Import requests
+import http_client
+import series_registry
+import storage
 
-DATABASE_FILE = 'economic_events.db'
+logger = logging.getLogger(__name__)
 
-# TODO: Store this securely, e.g., in environment variables or a config file
-DISCORD_WEBHOOK_URL = "https://discord.com/api/webhooks/1375824641087766589/1iEZ8S3Bcse7fnPyXuWku2oMbDQzWO925hH0hGGYX6wfjeGYu2pWG09eIMShkbUldzFW" # Replace with your actual webhook URL
+DATABASE_FILE = storage.DATABASE_FILE
+
+# TODO: Store this securely; the DISCORD_WEBHOOK_URL environment variable overrides the default below
+DISCORD_WEBHOOK_URL = os.environ.get('DISCORD_WEBHOOK_URL') or "https://discord.com/api/webhooks/1375824641087766589/1iEZ8S3Bcse7fnPyXuWku2oMbDQzWO925hH0hGGYX6wfjeGYu2pWG09eIMShkbUldzFW" # Replace with your actual webhook URL
+
+# Embed titles by event type
+EVENT_TITLES = {
+    'Revision': "數據修正提醒！ (Data Revision Alert!)",
+}
+
+# Embed colors by analytics severity
+SEVERITY_COLORS = {
+    'high': 15158332, # red
+    'medium': 15258703, # orange
+    'low': 3447003, # blue
+}
 
 def get_latest_event_from_db():
     """Retrieves the latest event from the database."""
-    conn = None
     latest_event = None
     try:
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
+        conn = storage.get_connection(DATABASE_FILE)
 
         # Select the latest event based on timestamp
-        cursor.execute("SELECT type, description, value, year, period, timestamp, source, series_id FROM events ORDER BY timestamp DESC LIMIT 1")
-        row = cursor.fetchone()
+        row = conn.execute("SELECT type, description, value, year, period, timestamp, source, series_id FROM events ORDER BY timestamp DESC, id DESC LIMIT 1").fetchone()
 
         if row:
             latest_event = {
@@ -33,32 +49,37 @@ def get_latest_event_from_db():
             }
 
     except sqlite3.Error as e:
-        print(f"Database error while fetching latest event: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Database error while fetching latest event: %s", e)
 
     return latest_event
 
 def send_notification(event):
     """Sends a real-time notification for an economic event to Discord."""
     if not event:
-        print("No event provided to send notification.")
+        logger.warning("No event provided to send notification.")
         return
 
-    print("\n--- Attempting to send notification to Discord ---")
+    logger.info("--- Attempting to send notification to Discord ---")
 
-    # Map series_id to Chinese and English names
-    series_name_map = {
-        'LNS14000000': 'Unemployment Rate (失業率)',
-        'CES0000000001': 'Nonfarm Payroll (非農就業人數)',
-        'CUUR0000SA0': 'CPI (All items) (消費者物價指數 - 所有項目)',
-        'WPUID000000': 'PPI (All commodities) (生產者物價指數 - 所有商品)'
+    # Construct the overall payload with the embed
+    payload = {
+        "embeds": [build_embed(event)] # Embeds should be in a list
+        # You can still add 'content' here for a message above the embed
     }
 
+    try:
+        response = http_client.request('POST', DISCORD_WEBHOOK_URL, json=payload, retries=0)
+        response.raise_for_status() # Raise an exception for bad status codes
+        logger.info("Notification successfully sent to Discord.")
+    except requests.exceptions.RequestException as e:
+        logger.error("Error sending notification to Discord: %s", e)
+
+def build_embed(event):
+    """Builds the Discord embed describing one economic event."""
     event_type = event.get('type', 'N/A')
     series_id = event.get('series_id', 'N/A')
-    series_name = series_name_map.get(series_id, f'Unknown Series ({series_id})')
+    # Chinese and English names come from the series registry (series.json)
+    series_name = series_registry.display_name(series_id)
     value = event.get('value', 'N/A')
     year = event.get('year', 'N/A')
     period = event.get('period', 'N/A')
@@ -67,12 +88,22 @@ def send_notification(event):
     # Get previous and expected values
     previous_value = event.get('previous_value', 'N/A') # Get previous value
     expected_value = event.get('expected_value', 'N/A') # Get expected value
+    severity = event.get('severity') or 'unknown'
+
+    # Summarize the analytics computed for the release (MoM/YoY change, surprise)
+    changes = []
+    if event.get('mom_change') is not None:
+        changes.append(f"MoM {event['mom_change']:+.2f}")
+    if event.get('yoy_pct') is not None:
+        changes.append(f"YoY {event['yoy_pct']:+.2f}%")
+    if event.get('surprise_z') is not None:
+        changes.append(f"Surprise z {event['surprise_z']:+.2f}")
 
     # Construct the Embed for Discord notification
     embed = {
-        "title": "經濟事件提醒！ (Economic Event Alert!)", # Embed Title
+        "title": EVENT_TITLES.get(event_type, "經濟事件提醒！ (Economic Event Alert!)"), # Embed Title
         "description": f"Type (類型): {event_type}", # Add event type to description
-        "color": 15258703, # Example color (a shade of orange), you can change this
+        "color": SEVERITY_COLORS.get(severity, 15258703), # Orange unless analytics rated the surprise
         "fields": [ # Add fields for structured data
             {
                 "name": "指標 (Indicator)",
@@ -85,7 +116,7 @@ def send_notification(event):
                 "inline": True
             },
              {
-                "name": "前期值 (Previous Value)",
+                "name": "修正前數值 (Before Revision)" if event_type == 'Revision' else "前期值 (Previous Value)",
                 "value": previous_value,
                 "inline": True
             },
@@ -103,30 +134,29 @@ def send_notification(event):
                 "name": "來源 (Source)",
                 "value": source,
                 "inline": True
+            },
+            {
+                "name": "變化 (Change)",
+                "value": ", ".join(changes) or 'N/A',
+                "inline": True
+            },
+            {
+                "name": "重要性 (Severity)",
+                "value": severity,
+                "inline": True
             }
             # You can add more fields as needed, e.g., link to source
         ],
         "timestamp": datetime.utcnow().isoformat() # Use UTC timestamp for consistency
         # You can also add a footer or author field if needed
     }
-
-    # Construct the overall payload with the embed
-    payload = {
-        "embeds": [embed] # Embeds should be in a list
-        # You can still add 'content' here for a message above the embed
-    }
-
-    try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload)
-        response.raise_for_status() # Raise an exception for bad status codes
-        print("Notification successfully sent to Discord.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending notification to Discord: {e}")
+    return embed
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(levelname)s %(name)s: %(message)s')
     # Example usage: Fetch latest event from DB and simulate sending notification
     latest_event = get_latest_event_from_db()
     if latest_event:
         send_notification(latest_event)
     else:
-        print("No events found in the database to send notification.") 
\ No newline at end of file
+        logger.warning("No events found in the database to send notification.") 
\ No newline at end of file
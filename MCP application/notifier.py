@@ -0,0 +1,77 @@
+"""Notifier: tails the event log and delivers alerts, independently of the collector.
+
+The notifier is the 'notifier' consumer group of the event log. Each batch of
+new events is routed through the subscription registry into the outbox in the
+same transaction that advances the group's checkpoint, then the outbox is
+flushed; failed posts are retried by the outbox dispatcher.
+
+Run it as its own process so a slow or failing webhook never stalls
+collection:
+
+    python notifier.py                      # tail from the last checkpoint
+    python notifier.py --from-offset 0      # replay everything still in the log
+    python data_collector.py --no-notifier  # collector that only writes events
+
+Without a separate notifier, the collector consumes the same group inline
+after each save (see data_collector.INLINE_NOTIFY); the checkpoint
+transaction keeps the two from delivering a record twice.
+"""
+import argparse
+import logging
+import os
+import threading
+
+import event_log
+import notification_dispatcher
+import storage
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_GROUP = 'notifier'
+PRUNE_INTERVAL = 3600  # seconds between event log retention sweeps
+
+def _enqueue(records, conn):
+    events = [record.event for record in records if record.topic == event_log.EVENTS_TOPIC]
+    notification_dispatcher.enqueue(events, conn=conn)
+
+def consume(group=CONSUMER_GROUP, limit=event_log.CONSUME_BATCH_SIZE):
+    """Moves the group's next batch of events into the outbox and flushes it; returns the batch size."""
+    count = event_log.consume(group, _enqueue, limit)
+    if count:
+        notification_dispatcher.dispatch_pending()
+    return count
+
+def _prune_loop(stop_event):
+    while not stop_event.wait(PRUNE_INTERVAL):
+        try:
+            removed = event_log.prune()
+            if removed:
+                logger.info("Pruned %d consumed event log record(s).", removed)
+        except Exception as e:
+            logger.error("Error while pruning the event log: %s", e)
+
+def run(group=CONSUMER_GROUP, stop_event=None):
+    """Tails the event log and delivers notifications until stop_event is set."""
+    stop_event = stop_event or threading.Event()
+    # Retries of failed posts, and outbox rows left over from earlier runs
+    threading.Thread(target=notification_dispatcher.run_dispatcher, args=(stop_event,),
+                     name='outbox-dispatcher', daemon=True).start()
+    threading.Thread(target=_prune_loop, args=(stop_event,), name='event-log-prune', daemon=True).start()
+    event_log.tail(group, _enqueue, stop_event,
+                   after_batch=lambda count: notification_dispatcher.dispatch_pending())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver notifications for events written by the collector.")
+    parser.add_argument('--group', default=CONSUMER_GROUP, help='consumer group (default: %(default)s)')
+    parser.add_argument('--from-offset', type=int, help='replay records after this offset')
+    args = parser.parse_args()
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    storage.init_database()
+    if args.from_offset is not None:
+        event_log.seek(args.group, args.from_offset)
+    try:
+        run(args.group)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,131 @@
+"""Normalized time-series store for BLS observations.
+
+Every data point returned by the API is kept in the observations table, keyed
+by (series_id, year, period), rather than only the two newest points of each
+poll. Writes touch only observations that are new or whose value changed, and
+a per-series watermark (the newest period stored) keeps each poll's requested
+year range as small as possible. The stored history also answers
+previous-value lookups locally, without asking the API again.
+"""
+import logging
+import sqlite3
+import time
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+ANNUAL_AVERAGE_PERIOD = 'M13'  # annual averages are not part of the monthly sequence
+REVISION_LOOKBACK_MONTHS = 2  # BLS revises the prior two months; keep them inside the poll window
+
+def _footnote_text(footnotes):
+    texts = [f['text'] for f in footnotes or [] if f and f.get('text')]
+    return "; ".join(texts) or None
+
+def store_series(series_list, conn=None):
+    """Writes new or changed observations for BLS response series in one transaction.
+
+    Returns {series_id: {'new': [(year, period, value)],
+                         'changed': [(year, period, old_value, new_value)]}}
+    for the series that had any difference from what was stored.
+    """
+    now = time.time()
+    changes = {}
+    with storage.transaction(conn) as c:
+        for series in series_list:
+            series_id = series['seriesID']
+            points = series.get('data') or []
+            if not points:
+                continue
+            years = [int(point['year']) for point in points]
+            stored = {
+                (year, period): value
+                for year, period, value in c.execute("""
+                    SELECT year, period, value FROM observations
+                    WHERE series_id = ? AND year BETWEEN ? AND ?;
+                """, (series_id, min(years), max(years)))
+            }
+
+            new, changed, rows = [], [], []
+            for point in points:
+                key = (int(point['year']), point['period'])
+                value = point['value']
+                old_value = stored.get(key)
+                if old_value is None:
+                    new.append((key[0], key[1], value))
+                elif old_value != value:
+                    changed.append((key[0], key[1], old_value, value))
+                else:
+                    continue
+                rows.append((series_id, key[0], key[1], value, _footnote_text(point.get('footnotes')), now))
+
+            if rows:
+                c.executemany("""
+                    INSERT INTO observations (series_id, year, period, value, footnotes, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (series_id, year, period) DO UPDATE SET
+                        value = excluded.value, footnotes = excluded.footnotes, updated_at = excluded.updated_at;
+                """, rows)
+                changes[series_id] = {'new': new, 'changed': changed}
+
+            periodic = [(int(p['year']), p['period']) for p in points if p['period'] != ANNUAL_AVERAGE_PERIOD]
+            if periodic:
+                latest_year, latest_period = max(periodic)
+                c.execute("""
+                    INSERT INTO series_watermarks (series_id, year, period, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (series_id) DO UPDATE SET
+                        year = excluded.year, period = excluded.period, updated_at = excluded.updated_at
+                    WHERE (excluded.year, excluded.period) > (series_watermarks.year, series_watermarks.period);
+                """, (series_id, latest_year, latest_period, now))
+        if changes:
+            storage.bump_table_version(c, 'observations')
+    return changes
+
+def get_watermarks(series_ids=None):
+    """Returns {series_id: (year, period)} of the newest stored observation per series."""
+    conn = storage.get_connection()
+    if series_ids is None:
+        rows = conn.execute("SELECT series_id, year, period FROM series_watermarks")
+    else:
+        series_ids = list(series_ids)
+        placeholders = ", ".join("?" * len(series_ids))
+        rows = conn.execute(f"""
+            SELECT series_id, year, period FROM series_watermarks WHERE series_id IN ({placeholders})
+        """, series_ids) if series_ids else []
+    return {series_id: (year, period) for series_id, year, period in rows}
+
+def plan_start_years(series_ids, current_year, default_start_year=None):
+    """Groups series by the earliest year a poll must request for them.
+
+    A series with a watermark only needs the watermark's year, or the year
+    before when its newest month is early enough that recent revisions reach
+    back across the year boundary. Series without history fall back to
+    `default_start_year` (the previous year by default).
+    """
+    default_start_year = current_year - 1 if default_start_year is None else default_start_year
+    try:
+        watermarks = get_watermarks(series_ids)
+    except sqlite3.Error as e:
+        logger.error("Database error while reading watermarks: %s", e)
+        watermarks = {}
+
+    groups = {}
+    for series_id in series_ids:
+        watermark = watermarks.get(series_id)
+        if watermark is None:
+            start_year = default_start_year
+        else:
+            year, period = watermark
+            month = int(period[1:]) if period.startswith('M') and period[1:].isdigit() else 12
+            start_year = year - 1 if month <= REVISION_LOOKBACK_MONTHS else year
+            start_year = min(start_year, current_year)
+        groups.setdefault(start_year, []).append(series_id)
+    return groups
+
+def get_previous_observation(series_id, year, period):
+    """Returns (year, period, value) of the stored observation just before (year, period), or None."""
+    return storage.get_connection().execute("""
+        SELECT year, period, value FROM observations
+        WHERE series_id = ? AND (year, period) < (?, ?) AND period != ?
+        ORDER BY year DESC, period DESC LIMIT 1;
+    """, (series_id, int(year), period, ANNUAL_AVERAGE_PERIOD)).fetchone()
@@ -0,0 +1,235 @@
+"""Asyncio pipeline for fetch -> persist -> notify.
+
+Each stage runs as its own task and stages are connected by bounded queues:
+
+    fetch tasks -> persist_queue -> detect/dedup/process/save -> notify_queue -> notify workers
+
+The persist stage runs data_collector.persist_response, which stores a
+response's changed observations and the events they produce in one
+transaction, so a chunk is either fully saved or left to be diffed again on
+the next poll.
+
+Fetches for a poll overlap each other (bounded by MAX_IN_FLIGHT), and
+notifications for one poll are delivered while the next poll's fetches are in
+flight. A stalled sink fills its queue, which blocks the stage in front of it
+instead of letting memory grow without bound.
+
+Every chunk is accounted for even when its stage fails: the failure is
+logged, the chunk is marked done and the poll's future raises the error once
+the other chunks have finished, so a caller waiting on a poll is never left
+hanging. A chunk contributes events only once they are committed, and its response
+fingerprint is committed with them, so a chunk that failed to save is not
+skipped as unchanged on the next poll.
+
+The stages reuse the synchronous functions in data_collector and notifier via
+asyncio.to_thread, so poll_once() remains a working synchronous entry point.
+Persisting a chunk appends its events to the event log; the notify stage then
+consumes the log into the outbox and flushes it, unless a separate notifier
+process does that (data_collector.INLINE_NOTIFY off).
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from datetime import datetime
+
+import data_collector
+import fetch_planner
+import http_client
+import leader_lease
+import metrics
+import notifier
+import observation_store
+import release_scheduler
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 16  # items buffered between two stages
+NOTIFY_WORKERS = 2  # outbox flushes in flight at once
+POLL_TIMEOUT = 300  # seconds a scheduled poll may take before run_forever gives up on it
+
+_STOP = object()
+
+class PollContext:
+    """Tracks one poll's chunks through the pipeline and collects its new events."""
+
+    def __init__(self, loop, pending):
+        self.pending = pending
+        self.events = []
+        self.error = None  # first exception raised while handling one of the chunks
+        self.future = loop.create_future()
+        if pending == 0:
+            self.future.set_result([])
+
+    def done_item(self, events=None, error=None):
+        """Marks one chunk finished, with the events it saved or the exception it failed with."""
+        if events:
+            self.events.extend(events)
+        if error is not None and self.error is None:
+            self.error = error
+        self.pending -= 1
+        if self.pending == 0 and not self.future.done():
+            if self.error is not None:
+                self.future.set_exception(self.error)
+            else:
+                self.future.set_result(self.events)
+
+class Pipeline:
+    """Long-lived set of stage tasks that polls can be submitted to."""
+
+    def __init__(self, api_key, queue_size=QUEUE_SIZE, max_in_flight=fetch_planner.MAX_IN_FLIGHT,
+                 notify_workers=NOTIFY_WORKERS, notify=None):
+        self.api_key = api_key
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight
+        self.notify_workers = notify_workers
+        # notify(events) delivers a persisted batch; by default the notifier consumes it from the event log
+        self.notify = notify or (lambda events: notifier.consume() if data_collector.INLINE_NOTIFY else None)
+        self._tasks = []
+
+    async def start(self):
+        self.persist_queue = asyncio.Queue(self.queue_size)
+        self.notify_queue = asyncio.Queue(self.queue_size)
+        self._fetch_slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = [asyncio.create_task(self._persist_stage())] + [asyncio.create_task(self._notify_worker()) for _ in range(self.notify_workers)]
+
+    async def close(self):
+        """Flushes queued work through every stage, then stops the tasks."""
+        await self.persist_queue.put(_STOP)
+        await self._tasks[0]
+        for _ in range(self.notify_workers):
+            await self.notify_queue.put(_STOP)
+        await asyncio.gather(*self._tasks[1:])
+
+    async def poll(self, series_ids, start_year, end_year):
+        """Fetches all chunks concurrently and returns the new events once they are persisted.
+
+        Notifications for those events are still being delivered when this
+        returns. Polls span fewer years than one API window, so every series
+        lands in exactly one chunk and chunks can be processed independently.
+        With start_year=None each series is requested from its stored watermark.
+        """
+        registered = bool(self.api_key)
+        if start_year is None:
+            groups = await asyncio.to_thread(observation_store.plan_start_years, series_ids, end_year)
+        else:
+            groups = {start_year: list(series_ids)}
+        plan = [
+            chunk
+            for group_start, group_ids in sorted(groups.items())
+            for chunk in fetch_planner.plan_requests(group_ids, group_start, end_year, registered)
+        ]
+        granted = await asyncio.to_thread(fetch_planner.reserve_quota, len(plan), registered)
+        if granted < len(plan):
+            logger.warning("Daily BLS API quota nearly exhausted: running %d of %d planned requests.", granted, len(plan))
+            plan = plan[:granted]
+
+        ctx = PollContext(asyncio.get_running_loop(), len(plan))
+        fetches = [asyncio.create_task(self._fetch(ctx, *chunk)) for chunk in plan]
+        await asyncio.gather(*fetches)
+        return await ctx.future
+
+    async def _fetch(self, ctx, chunk_ids, chunk_start, chunk_end):
+        try:
+            async with self._fetch_slots:
+                data, changed = await asyncio.to_thread(
+                    data_collector.fetch_bls_data_if_changed, self.api_key, chunk_ids, chunk_start, chunk_end)
+        except Exception as e:
+            logger.exception("Error fetching %d series (%s-%s): %s", len(chunk_ids), chunk_start, chunk_end, e)
+            ctx.done_item(error=e)
+            return
+        if not changed or not data:
+            ctx.done_item()
+            return
+        if data.get('status') != 'REQUEST_SUCCEEDED':
+            logger.error("BLS API request for %d series (%s-%s) failed: %s",
+                         len(chunk_ids), chunk_start, chunk_end, data.get('message'))
+            ctx.done_item()
+            return
+        await self.persist_queue.put((ctx, data_collector.bls_fingerprint_key(chunk_ids, chunk_start, chunk_end), data))
+
+    async def _persist_stage(self):
+        while True:
+            item = await self.persist_queue.get()
+            if item is _STOP:
+                return
+            ctx, fingerprint_key, data = item
+            # Changed observations and their events are committed together; None means nothing was
+            try:
+                events = await asyncio.to_thread(data_collector.persist_response, data)
+            except Exception as e:
+                logger.exception("Error while persisting a BLS response: %s", e)
+                http_client.discard_fingerprints([fingerprint_key])
+                ctx.done_item(error=e)
+                continue
+            if events is None:
+                http_client.discard_fingerprints([fingerprint_key])
+            else:
+                http_client.commit_fingerprints([fingerprint_key])
+            ctx.done_item(events)
+            if events:
+                await self.notify_queue.put(events)
+
+    async def _notify_worker(self):
+        while True:
+            events = await self.notify_queue.get()
+            if events is _STOP:
+                return
+            try:
+                await asyncio.to_thread(self.notify, events)
+            except Exception as e:
+                logger.exception("Error sending notification: %s", e)
+
+async def run_once(api_key, series_ids, start_year, end_year):
+    """Runs a single poll through the pipeline and waits for its notifications."""
+    pipeline = Pipeline(api_key)
+    await pipeline.start()
+    try:
+        return await pipeline.poll(series_ids, start_year, end_year)
+    finally:
+        await pipeline.close()
+
+def run_forever(api_key, series_ids, lease=None):
+    """Runs the release scheduler against the pipeline until interrupted.
+
+    The scheduler keeps its blocking sleeps on a worker thread; each poll it
+    triggers is submitted to the event loop and returns once that poll's
+    events are persisted, while their notifications continue in the background.
+    A poll that fails or runs past POLL_TIMEOUT is logged and counts as one
+    with no new events, so the scheduler keeps running.
+    With a leader_lease.Lease, polls run only while it is held.
+    """
+    async def main():
+        pipeline = Pipeline(api_key)
+        await pipeline.start()
+        loop = asyncio.get_running_loop()
+
+        def poll(ids):
+            year = datetime.now().year
+            metrics.incr('poll.count')
+            with metrics.timer('poll.total_ms'):
+                future = asyncio.run_coroutine_threadsafe(pipeline.poll(ids, None, year), loop)
+                try:
+                    return future.result(timeout=POLL_TIMEOUT)
+                except concurrent.futures.TimeoutError:
+                    future.cancel()
+                    metrics.incr('poll.timeouts')
+                    logger.error("Poll of %d series did not finish within %ds; abandoning it.", len(ids), POLL_TIMEOUT)
+                except Exception as e:
+                    metrics.incr('poll.errors')
+                    logger.error("Poll of %d series failed: %s", len(ids), e)
+                return []
+
+        if lease is not None:
+            poll = leader_lease.guarded(poll, lease, data_collector.keep_warm)
+
+        scheduler = threading.Thread(
+            target=release_scheduler.run, args=(poll, series_ids), name='release-scheduler', daemon=True)
+        scheduler.start()
+        try:
+            while scheduler.is_alive():
+                await asyncio.sleep(1)
+        finally:
+            await pipeline.close()
+
+    asyncio.run(main())
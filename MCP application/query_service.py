@@ -0,0 +1,285 @@
+"""Local read-only HTTP query API over stored events and observations.
+
+    python query_service.py --port 8765
+
+    GET /events?series_id=&type=&since=&until=&limit=&cursor=   newest first
+    GET /events/latest?per_series=3&series_id=...               latest N per series
+    GET /series/<series_id>/events?limit=&cursor=               one series, newest first
+    GET /series/<series_id>/observations?limit=&cursor=         stored history, newest period first
+    GET /health
+
+Every list is keyset-paginated: a page carries `next_cursor`, an opaque token
+holding the sort key of its last row, and the next page starts strictly after
+it. Pages therefore cost the same however deep a client reads, and rows
+written in between never shift or repeat a page. The sort keys are served by
+indexes (events (timestamp, id), events (series_id, id), and the observations
+primary key).
+
+Readers never slow the collector down: each request thread reads through its
+own read-only connection, and in WAL mode readers and the single writer do
+not block each other. Responses are cached, keyed by endpoint and
+parameters, and tagged with the versions of the tables they read: writers bump
+a counter in table_versions (storage.bump_table_version) in the transaction
+that changes the events or observations. A cached response is served only
+while those counters are unchanged, so the cache never serves data older than
+the last write, while commits that touch neither table (lease renewals, quota,
+notifier checkpoints) leave it warm. The counters are only re-read when
+SQLite's PRAGMA data_version shows that another connection committed, so
+dashboards polling the same query between releases never reach the tables.
+
+Flask (see requirements.txt) is imported only by create_app(); the query
+functions work without it. Under a WSGI server, serve
+`query_service:create_app()`.
+"""
+import argparse
+import base64
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_PER_SERIES = 100
+CACHE_MAX_ENTRIES = 1024
+
+EVENT_COLUMNS = ('id', 'type', 'description', 'value', 'previous_value', 'expected_value', 'severity',
+                 'year', 'period', 'timestamp', 'source', 'series_id')
+_EVENT_SELECT = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events"
+
+_local = threading.local()
+
+def _reader(database_file=None):
+    """This thread's read-only connection to the database."""
+    database_file = database_file or storage.DATABASE_FILE
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(database_file)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{database_file}?mode=ro", uri=True, isolation_level=None,
+                               check_same_thread=False, timeout=storage.BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA query_only=1")
+        connections[database_file] = conn
+    return conn
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(token, length):
+    """Returns the sort key in a cursor token; raises ValueError for a malformed one."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {token!r}") from e
+    if not isinstance(key, list) or len(key) != length:
+        raise ValueError(f"invalid cursor: {token!r}")
+    return key
+
+def _page(rows, limit, key):
+    """Builds a page from up to limit + 1 rows; the extra row only signals that another page exists."""
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit and items else None
+    return {'items': items, 'next_cursor': next_cursor}
+
+def _event(row):
+    return dict(zip(EVENT_COLUMNS, row))
+
+def list_events(conn, series_id=None, event_type=None, since=None, until=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Events newest first by (timestamp, id); since/until bound the ISO timestamp (inclusive/exclusive)."""
+    clauses, params = [], []
+    if cursor:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor, 2))
+    if series_id:
+        clauses.append("series_id = ?")
+        params.append(series_id)
+    if event_type:
+        clauses.append("type = ?")
+        params.append(event_type)
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(f"{_EVENT_SELECT}{where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                        params + [limit + 1]).fetchall()
+    return _page([_event(row) for row in rows], limit, lambda e: [e['timestamp'], e['id']])
+
+def series_events(conn, series_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One series' events, newest first by id."""
+    params = [series_id]
+    where = "series_id = ?"
+    if cursor:
+        where += " AND id < ?"
+        params.extend(decode_cursor(cursor, 1))
+    rows = conn.execute(f"{_EVENT_SELECT} WHERE {where} ORDER BY id DESC LIMIT ?", params + [limit + 1]).fetchall()
+    return _page([_event(row) for row in rows], limit, lambda e: [e['id']])
+
+def latest_events(conn, per_series=1, series_ids=None):
+    """The newest `per_series` events of each series, as {series_id: [events]}."""
+    if not series_ids:
+        # DISTINCT is answered from the (series_id, id) index alone
+        series_ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT series_id FROM events WHERE series_id IS NOT NULL ORDER BY series_id")]
+    return {
+        series_id: [_event(row) for row in conn.execute(
+            f"{_EVENT_SELECT} WHERE series_id = ? ORDER BY id DESC LIMIT ?", (series_id, per_series))]
+        for series_id in series_ids
+    }
+
+def series_observations(conn, series_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One series' stored observations, newest period first."""
+    params = [series_id]
+    where = "series_id = ?"
+    if cursor:
+        where += " AND (year, period) < (?, ?)"
+        params.extend(decode_cursor(cursor, 2))
+    rows = conn.execute(f"""
+        SELECT year, period, value, footnotes, updated_at FROM observations
+        WHERE {where} ORDER BY year DESC, period DESC LIMIT ?
+    """, params + [limit + 1]).fetchall()
+    items = [{'year': year, 'period': period, 'value': value, 'footnotes': footnotes, 'updated_at': updated_at}
+             for year, period, value, footnotes, updated_at in rows]
+    return _page(items, limit, lambda o: [o['year'], o['period']])
+
+class ResponseCache:
+    """LRU cache of query results, valid only while the tables they read are unchanged."""
+
+    def __init__(self, database_file=None, max_entries=CACHE_MAX_ENTRIES):
+        self.database_file = database_file
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (table versions, value)
+        self._lock = threading.Lock()
+        self._probe = None
+        self._probe_lock = threading.Lock()
+        self._data_version = None  # PRAGMA data_version at which _versions was read
+        self._versions = {}  # table name -> write counter from table_versions
+
+    def data_version(self):
+        """Current data_version on one dedicated connection; it changes after every commit elsewhere."""
+        with self._probe_lock:
+            return self._read_data_version()
+
+    def _read_data_version(self):
+        if self._probe is None:
+            database_file = self.database_file or storage.DATABASE_FILE
+            self._probe = sqlite3.connect(f"file:{database_file}?mode=ro", uri=True,
+                                          isolation_level=None, check_same_thread=False)
+        return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def versions(self):
+        """{table: write counter}; re-read only when some connection has committed since the last call."""
+        with self._probe_lock:
+            data_version = self._read_data_version()
+            if data_version != self._data_version:
+                self._versions = dict(self._probe.execute("SELECT name, version FROM table_versions"))
+                self._data_version = data_version
+            return self._versions
+
+    def get(self, key, compute, tables=('events',)):
+        """Returns the cached value for `key`, or compute() when one of `tables` changed since it was cached."""
+        versions = self.versions()
+        version = tuple(versions.get(table) for table in tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                metrics.incr('query.cache_hits')
+                return entry[1]
+        metrics.incr('query.cache_misses')
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def _limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value is None:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, maximum)
+
+def create_app(database_file=None, cache=None):
+    """Builds the Flask app serving the query endpoints."""
+    from flask import Flask, jsonify, request  # only the HTTP service needs Flask
+
+    app = Flask(__name__)
+    cache = cache or ResponseCache(database_file)
+
+    def respond(name, compute, tables=('events',)):
+        key = (name, request.path, tuple(sorted(request.args.items(multi=True))))
+        try:
+            with metrics.timer(f'query.{name}_ms'):
+                result = cache.get(key, lambda: compute(_reader(database_file)), tables)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except sqlite3.Error as e:
+            logger.error("Database error while serving %s: %s", request.full_path, e)
+            return jsonify({'error': 'database unavailable'}), 503
+        return jsonify(result)
+
+    @app.get('/events')
+    def events():
+        args = request.args
+        return respond('events', lambda conn: list_events(
+            conn, series_id=args.get('series_id'), event_type=args.get('type'), since=args.get('since'),
+            until=args.get('until'), cursor=args.get('cursor'), limit=_limit(args.get('limit'))))
+
+    @app.get('/events/latest')
+    def events_latest():
+        args = request.args
+        return respond('events_latest', lambda conn: latest_events(
+            conn, per_series=_limit(args.get('per_series'), default=1, maximum=MAX_PER_SERIES),
+            series_ids=args.getlist('series_id')))
+
+    @app.get('/series/<series_id>/events')
+    def events_of_series(series_id):
+        args = request.args
+        return respond('series_events', lambda conn: series_events(
+            conn, series_id, cursor=args.get('cursor'), limit=_limit(args.get('limit'))))
+
+    @app.get('/series/<series_id>/observations')
+    def observations_of_series(series_id):
+        args = request.args
+        return respond('series_observations', lambda conn: series_observations(
+            conn, series_id, cursor=args.get('cursor'), limit=_limit(args.get('limit'))), tables=('observations',))
+
+    @app.get('/health')
+    def health():
+        return jsonify({'status': 'ok', 'data_version': cache.data_version(), 'table_versions': cache.versions()})
+
+    return app
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, database_file=None):
+    """Migrates the database once, then serves the API with one thread per request."""
+    storage.init_database(database_file)
+    app = create_app(database_file)
+    logger.info("Query API listening on http://%s:%d", host, port)
+    app.run(host=host, port=port, threaded=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only HTTP query API over stored events and observations.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--database', help='SQLite file (default: $ECONOMIC_EVENTS_DB or economic_events.db)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    serve(args.host, args.port, args.database)
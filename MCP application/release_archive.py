@@ -0,0 +1,252 @@
+"""Bulk ingestion of archived Employment Situation release pages.
+
+Saved copies of empsit.nr0.htm (like the checked-in `BLS` file), in a
+directory tree or a tarball, are parsed on a process pool: each worker pulls
+the release's <pre> text out of a page and extracts the headline figures
+(payroll change, unemployment rate, participation, earnings, hours, prior
+month revisions) plus any dot-leader table rows. The parent process writes
+the results into release_archive in batches, one transaction per batch, so
+workers never touch SQLite.
+
+Pages that cannot be read or parsed are skipped; each is logged with the
+reason and listed in the returned IngestReport, and the run carries on. That
+includes a damaged tarball: a member that cannot be decompressed is skipped,
+and a truncated or corrupt archive ends after the pages read before the damage.
+
+    python collector_cli.py ingest-releases ~/bls-archive.tar.gz --workers 8
+"""
+import json
+import logging
+import os
+import re
+import tarfile
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import data_collector
+import storage
+
+logger = logging.getLogger(__name__)
+
+PAGES_PER_TASK = 16  # pages sent to a worker at once, to amortize inter-process overhead
+WRITE_BATCH_SIZE = 500  # parsed pages per database transaction
+PAGE_SUFFIXES = ('.htm', '.html', '')  # '' matches extensionless saves such as `BLS`
+# What reading a damaged tarball raises: tarfile.ReadError, EOFError on truncation, zlib.error or OSError on corruption
+ARCHIVE_ERRORS = (tarfile.TarError, EOFError, zlib.error, OSError)
+
+MONTHS = ('january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december')
+_MONTH = r"(January|February|March|April|May|June|July|August|September|October|November|December)"
+_NUMBER = r"([+-]?\d[\d,]*(?:\.\d+)?)"
+
+REFERENCE_RE = re.compile(r"THE EMPLOYMENT SITUATION\s*--\s*([A-Z]+)\s+(\d{4})")
+PAYROLL_RE = re.compile(r"Total nonfarm payroll employment (increased|decreased|changed little)(?: by (\d[\d,]*))?")
+FIGURE_RES = {
+    'labor_force_participation_rate': re.compile(r"labor force participation rate,? (?:at|was|remained at) (\d+\.\d) percent"),
+    'employment_population_ratio': re.compile(r"employment-population ratio,? (?:at|was|remained at) (\d+\.\d) percent"),
+    'unemployed_millions': re.compile(r"number of unemployed (?:people|persons),? at (\d+\.\d) million"),
+    'average_hourly_earnings': re.compile(
+        r"average hourly earnings for all employees on private nonfarm payrolls [^$]*?to \$(\d+\.\d\d)"),
+    'average_weekly_hours': re.compile(
+        r"average workweek for all employees on private nonfarm payrolls (?:was unchanged at|remained at|[^.]*? to) (\d+\.\d) hours"),
+}
+REVISION_RE = re.compile(rf"for {_MONTH} was revised (?:up|down) by [\d,]+, from {_NUMBER} to {_NUMBER}")
+TABLE_ROW_RE = re.compile(r"^[ \t]*(\S[^\n]*?)[ \t]*\.{2,}:?((?:[ \t]+[-+]?[\d,]*\.?\d+)+)[ \t]*$", re.MULTILINE)
+
+class IngestReport:
+    """Outcome of one ingest run."""
+    __slots__ = ('pages', 'stored', 'skipped', 'elapsed')
+
+    def __init__(self):
+        self.pages = 0
+        self.stored = 0
+        self.skipped = []  # (source, reason)
+        self.elapsed = 0.0
+
+    @property
+    def pages_per_second(self):
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"IngestReport({self.pages} page(s), {self.stored} stored, {len(self.skipped)} skipped, "
+                f"{self.pages_per_second:.1f} pages/s)")
+
+def _to_number(text):
+    value = float(text.replace(',', ''))
+    return int(value) if value.is_integer() and '.' not in text else value
+
+def parse_page(html_content):
+    """Extracts one release's figures from page HTML; raises ValueError when it is not a release page."""
+    text = data_collector.find_pre_text(html_content)
+    if text is None:
+        raise ValueError("no <pre> block")
+    prose = ' '.join(text.split())  # sentences wrap across lines in the <pre> text
+
+    reference = REFERENCE_RE.search(prose)
+    if not reference or reference.group(1).lower() not in MONTHS:
+        raise ValueError("no 'THE EMPLOYMENT SITUATION -- <MONTH> <YEAR>' heading")
+    reference_period = f"{reference.group(2)}-{MONTHS.index(reference.group(1).lower()) + 1:02d}"
+
+    figures = {}
+    payroll = PAYROLL_RE.search(prose)
+    if payroll:
+        change = _to_number(payroll.group(2)) if payroll.group(2) else 0
+        figures['nonfarm_payroll_change'] = -change if payroll.group(1) == 'decreased' else change
+    unemployment = data_collector.UNEMPLOYMENT_RE.search(prose)
+    if unemployment:
+        figures['unemployment_rate'] = float(unemployment.group(1))
+    for name, pattern in FIGURE_RES.items():
+        match = pattern.search(prose)
+        if match:
+            figures[name] = _to_number(match.group(1))
+    revisions = {
+        month.lower(): {'from': _to_number(old), 'to': _to_number(new)}
+        for month, old, new in REVISION_RE.findall(prose)
+    }
+    if revisions:
+        figures['payroll_revisions'] = revisions
+    if 'nonfarm_payroll_change' not in figures and 'unemployment_rate' not in figures:
+        raise ValueError("neither the payroll change nor the unemployment rate was found")
+
+    release_date = data_collector.RELEASE_DATE_RE.search(prose)
+    table_values = [
+        [' '.join(label.split()), [_to_number(value) for value in values.split()]]
+        for label, values in TABLE_ROW_RE.findall(text)
+    ]
+    return {
+        'reference_period': reference_period,
+        'release_date': release_date.group(0) if release_date else None,
+        'figures': figures,
+        'table_values': table_values,
+    }
+
+def _parse_task(pages):
+    """Worker entry point: pages are (source, path) or (source, bytes). Returns (source, record, error) tuples."""
+    results = []
+    for source, content in pages:
+        try:
+            if isinstance(content, str):
+                with open(content, 'rb') as f:
+                    content = f.read()
+            record = parse_page(content.decode('utf-8', errors='replace'))
+            results.append((source, record, None))
+        except (OSError, ValueError) as e:
+            results.append((source, None, str(e)))
+    return results
+
+def _skip(skipped, source, reason):
+    logger.warning("Skipping unreadable release page %s: %s", source, reason)
+    if skipped is not None:
+        skipped.append((source, reason))
+
+def _iter_archive(path, skipped=None):
+    try:
+        # Members are read in the parent: a compressed tarball can only be read sequentially
+        with tarfile.open(path, 'r:*') as archive:
+            for member in archive:
+                if not (member.isfile() and os.path.splitext(member.name)[1].lower() in PAGE_SUFFIXES):
+                    continue
+                try:
+                    content = archive.extractfile(member).read()
+                except ARCHIVE_ERRORS as e:
+                    _skip(skipped, member.name, f"unreadable archive member: {e}")
+                    continue
+                yield member.name, content
+    except ARCHIVE_ERRORS as e:
+        # The stream cannot be resynchronized past the damage; keep what was read before it
+        _skip(skipped, os.path.basename(path), f"unreadable archive: {e}")
+
+def iter_pages(path, skipped=None):
+    """Yields (source, path or bytes) for every candidate page in a directory tree or tarball.
+
+    Members of a damaged tarball that cannot be read are logged and appended
+    to `skipped` as (source, reason) instead of raising.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in PAGE_SUFFIXES and not name.startswith('.'):
+                    page_path = os.path.join(root, name)
+                    yield os.path.relpath(page_path, path), page_path
+    elif tarfile.is_tarfile(path):
+        yield from _iter_archive(path, skipped)
+    else:
+        yield os.path.basename(path), path
+
+def _tasks(pages, size):
+    task = []
+    for page in pages:
+        task.append(page)
+        if len(task) == size:
+            yield task
+            task = []
+    if task:
+        yield task
+
+def _store(records, conn=None):
+    now = time.time()
+    rows = [
+        (r['reference_period'], r['release_date'], r['figures'].get('nonfarm_payroll_change'),
+         r['figures'].get('unemployment_rate'), json.dumps(r['figures']), json.dumps(r['table_values']),
+         r['source'], now)
+        for r in records
+    ]
+    with storage.transaction(conn) as c:
+        c.executemany("""
+            INSERT INTO release_archive (reference_period, release_date, nonfarm_payroll_change, unemployment_rate,
+                                         figures, table_values, source, ingested_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (reference_period) DO UPDATE SET
+                release_date = excluded.release_date,
+                nonfarm_payroll_change = excluded.nonfarm_payroll_change,
+                unemployment_rate = excluded.unemployment_rate,
+                figures = excluded.figures, table_values = excluded.table_values,
+                source = excluded.source, ingested_at = excluded.ingested_at;
+        """, rows)
+    return len(rows)
+
+def ingest(path, workers=None, batch_size=WRITE_BATCH_SIZE, pages_per_task=PAGES_PER_TASK):
+    """Parses every page under `path` (a directory, tarball or single file) and stores the results.
+
+    Returns an IngestReport. When the same reference period appears in
+    several pages, the last one written wins.
+    """
+    report = IngestReport()
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pending_records = []
+
+    def handle(results):
+        for source, record, error in results:
+            report.pages += 1
+            if record is None:
+                logger.warning("Skipping malformed release page %s: %s", source, error)
+                report.skipped.append((source, error))
+                continue
+            record['source'] = source
+            pending_records.append(record)
+        if len(pending_records) >= batch_size:
+            report.stored += _store(pending_records)
+            pending_records.clear()
+            logger.info("Ingested %d page(s) so far (%.1f pages/s)", report.pages,
+                        report.pages / (time.perf_counter() - started))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded number of tasks in flight so a large tarball is never held in memory at once
+        in_flight = set()
+        for task in _tasks(iter_pages(path, report.skipped), pages_per_task):
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    handle(future.result())
+            in_flight.add(pool.submit(_parse_task, task))
+        for future in wait(in_flight).done:
+            handle(future.result())
+
+    if pending_records:
+        report.stored += _store(pending_records)
+    report.elapsed = time.perf_counter() - started
+    logger.info("Release ingest finished: %r", report)
+    return report
@@ -0,0 +1,264 @@
+"""Release-calendar-aware polling scheduler.
+
+Instead of polling every series every 60 seconds around the clock, the
+collector sleeps until just before the next expected release, burst-polls the
+releasing series at short, growing intervals until their new values show up,
+and then backs off until the next release.
+
+Release times come from RELEASE_SCHEDULE_FILE when it exists (see
+release_schedule.example.json for the format; an entry may set its own
+"timezone"). Entries with an unknown timezone or a malformed datetime are
+skipped with a warning. Series without a scheduled release fall back to times
+learned from stored history: the usual release time of day and the range of
+days in the month on which past releases were seen. Only "Data Release" events
+count, and not a series' first one, which records when collection started
+(e.g. the seeding poll on an empty database) rather than a release.
+
+Between releases, a safety poll every IDLE_POLL_INTERVAL covers only the
+series that are due: those with no upcoming scheduled release, except learned ones
+outside their usual days of the month. With hundreds of watched series this
+keeps the idle polls from spending the daily API quota. The first poll after
+startup covers every series.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+RELEASE_SCHEDULE_FILE = 'release_schedule.json'
+RELEASE_TIMEZONE = ZoneInfo('America/New_York')  # BLS releases are announced in ET
+
+PRE_RELEASE_LEAD = timedelta(seconds=15)  # wake this long before the release to warm the connection
+BURST_MIN_INTERVAL = 0.5  # seconds between polls right at the release
+BURST_MAX_INTERVAL = 5.0  # seconds; burst interval grows towards this
+BURST_GROWTH = 1.5
+BURST_WINDOW = timedelta(minutes=5)  # give up bursting this long after the release
+IDLE_POLL_INTERVAL = timedelta(minutes=30)  # safety poll for unscheduled series
+MAX_SLEEP = timedelta(hours=1)  # re-plan at least this often (picks up schedule edits)
+
+_warned_unscheduled = set()  # watched series already reported as missing from the release schedule
+
+class Release:
+    """One expected release: when it happens and which series it updates."""
+    __slots__ = ('at', 'series_ids', 'name')
+
+    def __init__(self, at, series_ids, name=''):
+        self.at = at
+        self.series_ids = list(series_ids)
+        self.name = name
+
+    def __repr__(self):
+        return f"Release({self.name or ','.join(self.series_ids)} at {self.at.isoformat()})"
+
+def load_schedule(path=RELEASE_SCHEDULE_FILE):
+    """Loads scheduled releases from a JSON file; returns [] if the file is missing or invalid."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error("Could not read release schedule '%s': %s", path, e)
+        return []
+
+    default_timezone = config.get('timezone', 'America/New_York')
+    releases = []
+    for entry in config.get('releases', []):
+        try:
+            tz = ZoneInfo(entry.get('timezone', default_timezone))
+            entry_releases = []
+            for stamp in entry.get('datetimes', []):
+                at = datetime.fromisoformat(stamp)
+                if at.tzinfo is None:
+                    at = at.replace(tzinfo=tz)
+                entry_releases.append(Release(at, entry.get('series', []), entry.get('name', '')))
+        except (ValueError, ZoneInfoNotFoundError) as e:
+            logger.warning("Skipping release schedule entry %r in '%s': %s", entry.get('name', ''), path, e)
+            continue
+        releases.extend(entry_releases)
+    releases.sort(key=lambda r: r.at)
+    return releases
+
+def learn_release_patterns(series_ids):
+    """Learns each series' usual release time and day-of-month range from stored events.
+
+    Returns {series_id: (release_time, first_day, last_day)}. Only "Data Release"
+    events are used: revisions are detected whenever a later poll happens to see
+    them. Each series' first event is skipped too, since it was created when
+    collection of the series started, not when BLS released it. Detection
+    timestamps are floored to the half hour, since BLS releases land on :00/:30.
+    """
+    patterns = {}
+    try:
+        conn = storage.get_connection()
+        placeholders = ", ".join("?" * len(series_ids))
+        rows = conn.execute(f"""
+            SELECT series_id, timestamp FROM events
+            WHERE series_id IN ({placeholders}) AND type = 'Data Release' AND timestamp IS NOT NULL
+              AND id > (SELECT MIN(first.id) FROM events AS first WHERE first.series_id = events.series_id)
+        """, list(series_ids)).fetchall()
+    except sqlite3.Error as e:
+        logger.error("Database error while learning release times: %s", e)
+        return patterns
+
+    seen = {}
+    for series_id, stamp in rows:
+        try:
+            # Stored timestamps are naive local times; astimezone() interprets them as such
+            detected = datetime.fromisoformat(stamp).astimezone(RELEASE_TIMEZONE)
+        except ValueError:
+            continue
+        floored = detected.replace(minute=30 if detected.minute >= 30 else 0, second=0, microsecond=0)
+        seen.setdefault(series_id, []).append(floored)
+
+    for series_id, times in seen.items():
+        times_of_day = sorted(t.time() for t in times)
+        days = [t.day for t in times]
+        patterns[series_id] = (times_of_day[len(times_of_day) // 2], min(days), max(days))
+    return patterns
+
+def scheduled_series(series_ids, schedule, now):
+    """The watched series with a scheduled release whose burst window has not yet passed.
+
+    Warns once per series when a schedule is loaded but has nothing upcoming
+    for a watched series (e.g. every listed datetime is in the past), since
+    that series then falls back to learned times and the idle poll.
+    """
+    live = {s for r in schedule if r.at + BURST_WINDOW > now for s in r.series_ids}
+    if schedule:
+        stale = [s for s in series_ids if s not in live and s not in _warned_unscheduled]
+        if stale:
+            logger.warning("Release schedule has no upcoming release for: %s; polling them on learned times "
+                           "and the idle poll instead.", ', '.join(stale))
+            _warned_unscheduled.update(stale)
+    _warned_unscheduled.difference_update(live)
+    return live
+
+def idle_poll_series(series_ids, now, schedule=None, patterns=None):
+    """Returns the series the periodic safety poll should cover at `now`.
+
+    Series with an upcoming scheduled release are burst-polled at its time
+    instead. Series with a learned pattern are due only within their usual
+    day-of-month window (widened by a day each side, as in _learned_releases);
+    series without one are always due.
+    """
+    schedule = load_schedule() if schedule is None else schedule
+    scheduled_ids = scheduled_series(series_ids, schedule, now)
+    unscheduled = [s for s in series_ids if s not in scheduled_ids]
+    if patterns is None:
+        patterns = learn_release_patterns(unscheduled) if unscheduled else {}
+    day = now.astimezone(RELEASE_TIMEZONE).day
+    due = []
+    for series_id in unscheduled:
+        pattern = patterns.get(series_id)
+        if pattern is None or pattern[1] - 1 <= day <= pattern[2] + 1:
+            due.append(series_id)
+    return due
+
+def _learned_releases(patterns, now, horizon_days=45):
+    """Expands learned patterns into candidate release times on weekdays after `now`."""
+    releases = []
+    start = now.astimezone(RELEASE_TIMEZONE).date()
+    for offset in range(horizon_days):
+        day = start + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for series_id, (release_time, first_day, last_day) in patterns.items():
+            # Widen the learned window by a day each side; release days shift around weekends
+            if first_day - 1 <= day.day <= last_day + 1:
+                at = datetime.combine(day, release_time, tzinfo=RELEASE_TIMEZONE)
+                releases.append(Release(at, [series_id], 'learned'))
+    return releases
+
+def next_release(series_ids, now, schedule=None, patterns=None, completed=()):
+    """Returns the next Release (series merged if they share a time) still worth bursting for.
+
+    Releases whose time is in `completed` have already been burst-polled.
+    """
+    schedule = load_schedule() if schedule is None else schedule
+    watched = set(series_ids)
+    scheduled_ids = scheduled_series(series_ids, schedule, now)
+    if patterns is None:
+        unscheduled = [s for s in series_ids if s not in scheduled_ids]
+        patterns = learn_release_patterns(unscheduled) if unscheduled else {}
+
+    candidates = [r for r in schedule if watched.intersection(r.series_ids)]
+    candidates += _learned_releases(patterns, now)
+    # A release is still live until its burst window has passed
+    upcoming = [r for r in candidates if r.at + BURST_WINDOW > now and r.at not in completed]
+    if not upcoming:
+        return None
+
+    first_at = min(r.at for r in upcoming)
+    due = []
+    for r in upcoming:
+        if r.at == first_at:
+            due.extend(s for s in r.series_ids if s in watched and s not in due)
+    return Release(first_at, due, next(r.name for r in upcoming if r.at == first_at))
+
+def burst_poll(poll, release, now_fn, sleep_fn):
+    """Polls the releasing series at short, growing intervals until all have new values.
+
+    Only "Data Release" events end a series' burst; a revision of an earlier
+    period seen in the window does not mean the new value has landed.
+    """
+    pending = set(release.series_ids)
+    deadline = release.at + BURST_WINDOW
+    interval = BURST_MIN_INTERVAL
+    polls = 0
+    logger.info("Burst polling for %s (%d series)", release, len(pending))
+    while pending and now_fn() < deadline:
+        events = poll(sorted(pending)) or []
+        polls += 1
+        pending.difference_update(e.get('series_id') for e in events if e.get('type') == 'Data Release')
+        if not pending:
+            break
+        now = now_fn()
+        if now < release.at:
+            # The early poll only warms the connection; wait for the release itself
+            sleep_fn((release.at - now).total_seconds())
+            continue
+        sleep_fn(interval)
+        interval = min(interval * BURST_GROWTH, BURST_MAX_INTERVAL)
+    if pending:
+        logger.warning("Burst window closed with no new data for: %s", ', '.join(sorted(pending)))
+    else:
+        logger.info("All series for %s updated after %d poll(s).", release, polls)
+    return polls
+
+def run(poll, series_ids, now_fn=None, sleep_fn=time.sleep):
+    """Drives `poll(series_ids) -> new events` forever, following the release calendar."""
+    now_fn = now_fn or (lambda: datetime.now(RELEASE_TIMEZONE))
+    last_full_poll = None
+    completed = set()
+    while True:
+        now = now_fn()
+        # Periodic safety poll of the due series; the first one covers everything and seeds learned history
+        if last_full_poll is None or now - last_full_poll >= IDLE_POLL_INTERVAL:
+            due = series_ids if last_full_poll is None else idle_poll_series(series_ids, now)
+            if due:
+                poll(due)
+            else:
+                logger.info("No series due for the idle poll.")
+            last_full_poll = now_fn()
+            continue
+
+        release = next_release(series_ids, now, completed=completed)
+        wake_at = release.at - PRE_RELEASE_LEAD if release else None
+        if wake_at is not None and wake_at <= now:
+            burst_poll(poll, release, now_fn, sleep_fn)
+            completed.add(release.at)
+            continue
+
+        next_idle = last_full_poll + IDLE_POLL_INTERVAL
+        wake = min(t for t in (wake_at, next_idle, now + MAX_SLEEP) if t is not None)
+        seconds = max((wake - now).total_seconds(), 0)
+        logger.info("Next release: %s; sleeping %.0fs", release or 'none scheduled', seconds)
+        sleep_fn(seconds)
@@ -0,0 +1,146 @@
+"""Replay of recorded BLS traffic through the collection pipeline, offline.
+
+Each response in a traffic_recorder recording goes through the stages a live
+poll runs. A BLS API body is parsed (bls_stream), then
+data_collector.persist_response diffs and stores it (change_detector), turns
+it into release and revision events (process_changes, i.e.
+extract_economic_data -> process_economic_data and analytics) and saves them,
+which appends them to the event log, all in one transaction. A
+release page is parsed with extract_nonfarm_data_from_html. After every
+record, a DummyNotifier consumes the event log the way notifier.py does and
+builds each Discord embed, but posts nothing.
+
+speed=1 keeps the recorded gaps between responses, so the replay has the
+traffic shape of the original morning. speed=10 runs ten times faster, and
+speed=0 runs as fast as possible, for throughput. Per-stage timings are
+taken from the metrics registry, so a replay before and after a change
+profiles the same traffic.
+
+Replays belong in a scratch database: collector_cli.py replay uses a
+temporary one unless --database is given. The replay's consumer group is
+dropped when the replay ends, so it never holds back event_log.prune() in a
+database that is kept.
+
+    python collector_cli.py replay mornings/2026-09-04.jsonl.gz --speed 0
+"""
+import logging
+import time
+
+import bls_stream
+import change_detector
+import data_collector
+import event_dedup
+import event_log
+import metrics
+import notification_service
+import traffic_recorder
+
+logger = logging.getLogger(__name__)
+
+REPLAY_GROUP = 'replay'
+REPORTED_STAGES = ('replay.record_ms', 'parse.bls_json_ms', 'db.store_observations_ms', 'analytics.ms',
+                   'db.transaction_ms', 'parse.release_page_ms', 'replay.notify_latency_ms')
+
+class DummyNotifier:
+    """Event-log consumer that builds each notification like the real one and then drops it."""
+
+    def __init__(self, keep=False):
+        self.notifications = 0
+        self.sent = [] if keep else None  # (event, embed) pairs when keep=True
+        self.arrived_at = None  # perf_counter() at which the record being replayed "arrived"
+
+    def handle(self, records, conn):
+        now = time.perf_counter()
+        for record in records:
+            embed = notification_service.build_embed(record.event)
+            self.notifications += 1
+            if self.sent is not None:
+                self.sent.append((record.event, embed))
+            if self.arrived_at is not None:
+                metrics.observe('replay.notify_latency_ms', (now - self.arrived_at) * 1000.0)
+
+class ReplayReport:
+    """Outcome of one replay."""
+    __slots__ = ('records', 'api_responses', 'pages', 'events', 'notifications', 'elapsed', 'recorded_span', 'stages')
+
+    def __init__(self):
+        self.records = 0
+        self.api_responses = 0
+        self.pages = 0
+        self.events = 0
+        self.notifications = 0
+        self.elapsed = 0.0  # wall seconds of the replay
+        self.recorded_span = 0.0  # seconds between the first and last recorded response
+        self.stages = {}  # metric name -> histogram summary
+
+    @property
+    def records_per_second(self):
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"ReplayReport({self.records} record(s) in {self.elapsed:.2f}s, {self.records_per_second:.1f}/s, "
+                f"{self.events} event(s), {self.notifications} notification(s))")
+
+def _replay_bls(record):
+    if record.status != 200:
+        return []
+    with metrics.timer('parse.bls_json_ms'):
+        data = bls_stream.parse_bytes(record.body.encode('utf-8'))
+    return data_collector.persist_response(data) or []
+
+def _replay_page(record):
+    if record.status != 200:
+        return
+    with metrics.timer('parse.release_page_ms'):
+        data_collector.extract_nonfarm_data_from_html(record.body)
+
+def replay(path, speed=0.0, notifier=None, sleep_fn=time.sleep):
+    """Replays the recording at `path`; returns a ReplayReport.
+
+    speed is a multiple of the recorded pace (1 = real time); 0 replays as
+    fast as possible.
+    """
+    notifier = notifier or DummyNotifier()
+    report = ReplayReport()
+    # Start from the state of a fresh process, as the recorded run did
+    change_detector.reset()
+    event_dedup.reset()
+    metrics.reset()
+    event_log.seek(REPLAY_GROUP, event_log.latest_offset())
+
+    first_t = last_t = None
+    started = time.perf_counter()
+    try:
+        for record in traffic_recorder.read(path):
+            if first_t is None:
+                first_t = record.t
+            last_t = record.t
+            if speed > 0:
+                delay = (record.t - first_t) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    sleep_fn(delay)
+
+            notifier.arrived_at = time.perf_counter()
+            with metrics.timer('replay.record_ms'):
+                if record.kind == traffic_recorder.BLS_API:
+                    report.api_responses += 1
+                    report.events += len(_replay_bls(record))
+                elif record.kind == traffic_recorder.RELEASE_PAGE:
+                    report.pages += 1
+                    _replay_page(record)
+                else:
+                    logger.warning("Skipping recorded response of unknown kind %r", record.kind)
+                while event_log.consume(REPLAY_GROUP, notifier.handle):
+                    pass
+            report.records += 1
+    finally:
+        # A stale checkpoint would pin the log: prune() keeps everything past the slowest group
+        event_log.drop_group(REPLAY_GROUP)
+
+    report.elapsed = time.perf_counter() - started
+    report.recorded_span = (last_t - first_t) if first_t is not None else 0.0
+    report.notifications = notifier.notifications
+    histograms = metrics.snapshot()['histograms']
+    report.stages = {name: histograms[name] for name in REPORTED_STAGES if name in histograms}
+    logger.info("Replay finished: %r", report)
+    return report
@@ -0,0 +1,69 @@
+"""Config-driven registry of the BLS series the collector watches.
+
+Series are listed in SERIES_CONFIG_FILE (series.json) with a human-readable
+name, a bilingual display name for notifications, a group (e.g. "cpi",
+"employment", "state_unemployment"), an optional simulated expected value for
+display, and an optional numeric expectation ("measure" is one of level,
+mom_change, mom_pct or yoy_pct) used by analytics for surprise scoring.
+Adding a series to the file is all that is needed to start watching it.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SERIES_CONFIG_FILE = 'series.json'
+
+_registry = None
+
+def load_registry(path=SERIES_CONFIG_FILE):
+    """Loads the registry from disk, returning {series_id: entry} in file order."""
+    global _registry
+    registry = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            for entry in config.get('series', []):
+                if entry.get('enabled', True):
+                    registry[entry['series_id']] = entry
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Could not read series registry '%s': %s", path, e)
+    else:
+        logger.warning("Series registry '%s' not found; no series will be watched.", path)
+    _registry = registry
+    return registry
+
+def get_registry():
+    """Returns the loaded registry, loading it on first use."""
+    if _registry is None:
+        load_registry()
+    return _registry
+
+def get_series_ids(groups=None):
+    """Returns the watched series IDs, optionally only those in the given groups."""
+    registry = get_registry()
+    if groups is None:
+        return list(registry)
+    groups = set(groups)
+    return [series_id for series_id, entry in registry.items() if entry.get('group') in groups]
+
+def series_name(series_id, default="Unknown Series"):
+    """Human-readable series name used in event descriptions."""
+    return get_registry().get(series_id, {}).get('name', default)
+
+def display_name(series_id):
+    """Bilingual series name used in notifications."""
+    entry = get_registry().get(series_id)
+    if not entry:
+        return f'Unknown Series ({series_id})'
+    return entry.get('display_name', entry.get('name', series_id))
+
+def expected_value(series_id):
+    """Simulated expected value for a series, or "N/A" when none is configured."""
+    return get_registry().get(series_id, {}).get('expected', "N/A")
+
+def expectation(series_id):
+    """Numeric expectation {'measure', 'value', 'stdev'} used for surprise scoring, or None."""
+    return get_registry().get(series_id, {}).get('expectation')
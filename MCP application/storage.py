@@ -0,0 +1,314 @@
+"""Shared SQLite storage layer for the collector, notifier and query tools.
+
+Every process keeps one long-lived connection per thread instead of opening
+the database file for each call. The file runs in WAL mode, so readers (the
+notifier, ad-hoc queries) and the single writer (the collector) no longer
+block each other. Schema changes are applied as numbered migrations tracked in
+PRAGMA user_version.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = os.environ.get('ECONOMIC_EVENTS_DB', 'economic_events.db')
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384  # 16 MiB page cache per connection
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+
+_local = threading.local()
+_migrate_lock = threading.Lock()
+_migrated_files = set()
+
+def _migration_1(cursor):
+    """Creates the events table in its original shape."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            description TEXT,
+            value TEXT,
+            year TEXT,
+            period TEXT,
+            timestamp TEXT,
+            source TEXT,
+            series_id TEXT
+        );
+    """)
+
+def _migration_2(cursor):
+    """Adds the previous/expected value columns that were first added by hand."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(events)")}
+    for column in ('previous_value', 'expected_value'):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE events ADD COLUMN {column} TEXT")
+
+def _migration_3(cursor):
+    """Drops duplicate events and adds the unique natural-key index used for dedup."""
+    cursor.execute("""
+        DELETE FROM events WHERE id NOT IN (
+            SELECT MIN(id) FROM events GROUP BY series_id, year, period, value
+        );
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_natural_key
+        ON events (series_id, year, period, value);
+    """)
+
+def _migration_4(cursor):
+    """Adds the api_quota table tracking BLS API queries spent per day."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS api_quota (
+            day TEXT PRIMARY KEY,
+            used INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+
+def _migration_5(cursor):
+    """Adds the notification_outbox table holding alerts until they are delivered."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destination TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            next_attempt_at REAL NOT NULL,
+            sent_at REAL,
+            last_error TEXT
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_pending
+        ON notification_outbox (next_attempt_at) WHERE status = 'pending';
+    """)
+
+def _migration_6(cursor):
+    """Adds the observations time-series table and per-series watermarks."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS observations (
+            series_id TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            value TEXT NOT NULL,
+            footnotes TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (series_id, year, period)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS series_watermarks (
+            series_id TEXT PRIMARY KEY,
+            year INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+
+def _migration_7(cursor):
+    """Adds the severity column computed by analytics for each event."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(events)")}
+    if 'severity' not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN severity TEXT")
+
+def _migration_8(cursor):
+    """Adds the subscriptions table routing events to webhook destinations."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            destination TEXT NOT NULL,
+            series_id TEXT,
+            series_group TEXT,
+            min_surprise_z REAL,
+            min_severity TEXT,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
+        );
+    """)
+
+def _migration_9(cursor):
+    """Adds the append-only event_log table and per-consumer-group checkpoints."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_log (
+            log_offset INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER,
+            topic TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS event_log_consumers (
+            consumer_group TEXT PRIMARY KEY,
+            committed_offset INTEGER NOT NULL DEFAULT 0,
+            wakeup_port INTEGER,
+            updated_at REAL NOT NULL
+        );
+    """)
+
+def _migration_10(cursor):
+    """Adds the release_archive table of figures parsed from archived Employment Situation pages."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS release_archive (
+            reference_period TEXT PRIMARY KEY,
+            release_date TEXT,
+            nonfarm_payroll_change INTEGER,
+            unemployment_rate REAL,
+            figures TEXT NOT NULL,
+            table_values TEXT NOT NULL,
+            source TEXT,
+            ingested_at REAL NOT NULL
+        );
+    """)
+
+def _migration_11(cursor):
+    """Adds the events indexes behind newest-first and per-series keyset pagination."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp, id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_series ON events (series_id, id);")
+
+def _migration_12(cursor):
+    """Adds the leases table used to elect a single active collector."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            epoch INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            renewed_at REAL NOT NULL
+        );
+    """)
+
+def _migration_13(cursor):
+    """Adds per-table write counters, so readers can tell when the events or observations changed."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name) VALUES ('events'), ('observations');")
+
+# Ordered list of (version, migration). Append new migrations; never edit applied ones.
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+    (8, _migration_8),
+    (9, _migration_9),
+    (10, _migration_10),
+    (11, _migration_11),
+    (12, _migration_12),
+    (13, _migration_13),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _open_connection(database_file):
+    conn = sqlite3.connect(
+        database_file,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit; writes use explicit transactions
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    # WAL is persistent in the file, so only switch when needed
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal':
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe from corruption in WAL mode
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def get_connection(database_file=None):
+    """Returns this thread's long-lived connection, opening and migrating it on first use."""
+    database_file = database_file or DATABASE_FILE
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(database_file)
+    if conn is None:
+        conn = _open_connection(database_file)
+        migrate(conn, database_file)
+        connections[database_file] = conn
+    return conn
+
+def close_connection(database_file=None):
+    """Closes this thread's connection(s); the next call to get_connection reopens."""
+    connections = getattr(_local, 'connections', {})
+    targets = [database_file] if database_file else list(connections)
+    for name in targets:
+        conn = connections.pop(name, None)
+        if conn:
+            conn.close()
+
+@contextmanager
+def transaction(conn=None, immediate=True):
+    """Runs a block in one transaction; nested uses join the outer transaction.
+
+    BEGIN IMMEDIATE takes the write lock up front, so two writers queue on the
+    busy timeout instead of failing with a lock upgrade deadlock.
+    """
+    conn = conn or get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    with metrics.timer('db.transaction_ms'):
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            metrics.incr('db.rollbacks')
+            raise
+        else:
+            conn.execute("COMMIT")
+
+def bump_table_version(conn, name):
+    """Increments `name`'s counter in table_versions; call inside the transaction that wrote to the table."""
+    conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = ?", (name,))
+
+def migrate(conn, database_file=None):
+    """Applies pending migrations; cheap no-op once the file is at SCHEMA_VERSION."""
+    database_file = database_file or DATABASE_FILE
+    if database_file in _migrated_files:
+        return SCHEMA_VERSION
+    with _migrate_lock:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with transaction(conn):
+                # Re-read under the write lock in case another process migrated first
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                cursor = conn.cursor()
+                for target, migration in MIGRATIONS:
+                    if target > version:
+                        logger.info("Applying database migration %d: %s", target, migration.__doc__)
+                        migration(cursor)
+                        cursor.execute(f"PRAGMA user_version = {target}")
+                        version = target
+        _migrated_files.add(database_file)
+    return version
+
+def init_database(database_file=None):
+    """Opens the shared connection and brings the schema up to date."""
+    database_file = database_file or DATABASE_FILE
+    logger.info("Initializing database: %s", database_file)
+    try:
+        get_connection(database_file)
+        logger.info("Database initialized successfully.")
+        return True
+    except sqlite3.Error as e:
+        logger.error("Database error: %s", e)
+        return False
@@ -0,0 +1,207 @@
+"""Subscription registry routing events to webhook destinations.
+
+Each row of the subscriptions table sends matching events to one destination.
+A subscription selects a single series (series_id), a registry group
+(series_group, e.g. "cpi"), or every series when both are empty, and can add
+conditions: a minimum absolute surprise z-score and/or a minimum severity.
+
+Routing does not scan the table per event. Subscriptions are compiled into an
+index from series ID to the subscriptions that can match it (groups are
+resolved to their series through the series registry), so matching an event
+costs one dict lookup plus a check per candidate. The index is rebuilt only
+when the table changes. With no subscriptions configured, every event goes to
+notification_service.DISCORD_WEBHOOK_URL as before.
+"""
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+
+import notification_service
+import series_registry
+import storage
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_RANK = {'unknown': 0, 'low': 1, 'medium': 2, 'high': 3}
+
+_index = None
+_index_signature = None
+_index_lock = threading.Lock()
+
+class Subscription:
+    """One destination's interest in a series or group, with optional conditions."""
+    __slots__ = ('id', 'name', 'destination', 'series_id', 'series_group', 'min_surprise_z', 'min_severity')
+
+    def __init__(self, id, name, destination, series_id=None, series_group=None,
+                 min_surprise_z=None, min_severity=None):
+        self.id = id
+        self.name = name
+        self.destination = destination
+        self.series_id = series_id
+        self.series_group = series_group
+        self.min_surprise_z = min_surprise_z
+        self.min_severity = min_severity
+
+    def matches(self, event):
+        """Checks the conditions; the series/group selector is applied by the index."""
+        if self.min_surprise_z is not None:
+            z = event.get('surprise_z')
+            if z is None or abs(z) < self.min_surprise_z:
+                return False
+        if self.min_severity is not None:
+            if SEVERITY_RANK.get(event.get('severity') or 'unknown', 0) < SEVERITY_RANK.get(self.min_severity, 0):
+                return False
+        return True
+
+    def __repr__(self):
+        target = self.series_id or (f"group {self.series_group}" if self.series_group else "all series")
+        return f"Subscription({self.id}, {self.name or '-'}, {target})"
+
+class SubscriptionIndex:
+    """Series ID -> candidate subscriptions, plus the subscriptions that match every series."""
+    __slots__ = ('by_series', 'all_series', 'count')
+
+    def __init__(self, subscriptions):
+        self.by_series = {}
+        self.all_series = []
+        self.count = len(subscriptions)
+        groups = {}
+        for series_id, entry in series_registry.get_registry().items():
+            groups.setdefault(entry.get('group'), []).append(series_id)
+        for subscription in subscriptions:
+            if subscription.series_id:
+                self.by_series.setdefault(subscription.series_id, []).append(subscription)
+            elif subscription.series_group:
+                for series_id in groups.get(subscription.series_group, []):
+                    self.by_series.setdefault(series_id, []).append(subscription)
+            else:
+                self.all_series.append(subscription)
+
+    def match(self, event):
+        """Returns the destinations for one event, each at most once."""
+        destinations = []
+        candidates = self.by_series.get(event.get('series_id'), [])
+        if self.all_series:
+            candidates = candidates + self.all_series
+        for subscription in candidates:
+            if subscription.destination not in destinations and subscription.matches(event):
+                destinations.append(subscription.destination)
+        return destinations
+
+def _load_subscriptions(conn):
+    rows = conn.execute("""
+        SELECT id, name, destination, series_id, series_group, min_surprise_z, min_severity
+        FROM subscriptions WHERE enabled = 1 ORDER BY id;
+    """)
+    return [Subscription(*row) for row in rows]
+
+def get_index(conn=None):
+    """Returns the compiled index, rebuilding it when the subscriptions table has changed."""
+    global _index, _index_signature
+    conn = conn or storage.get_connection()
+    signature = conn.execute("SELECT COUNT(*), MAX(updated_at) FROM subscriptions").fetchone()
+    if _index is None or signature != _index_signature:
+        with _index_lock:
+            _index = SubscriptionIndex(_load_subscriptions(conn))
+            _index_signature = signature
+    return _index
+
+def invalidate():
+    """Forces the next get_index() to rebuild, e.g. after series.json groups changed."""
+    global _index
+    _index = None
+
+def route(events, conn=None):
+    """Maps events to destinations: returns [(destination, [events])] in first-seen order."""
+    try:
+        index = get_index(conn)
+    except sqlite3.Error as e:
+        logger.error("Database error while loading subscriptions: %s", e)
+        index = None
+    if index is None or not index.count:
+        events = list(events)
+        return [(notification_service.DISCORD_WEBHOOK_URL, events)] if events else []
+
+    routed = {}
+    for event in events:
+        for destination in index.match(event):
+            routed.setdefault(destination, []).append(event)
+    return list(routed.items())
+
+def add_subscription(destination, series_id=None, series_group=None, min_surprise_z=None,
+                     min_severity=None, name=None, conn=None):
+    """Adds a subscription and returns its id."""
+    if min_severity is not None and min_severity not in SEVERITY_RANK:
+        raise ValueError(f"Unknown severity '{min_severity}'; expected one of {', '.join(SEVERITY_RANK)}")
+    with storage.transaction(conn) as c:
+        cursor = c.execute("""
+            INSERT INTO subscriptions (name, destination, series_id, series_group, min_surprise_z, min_severity, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+        """, (name, destination, series_id, series_group, min_surprise_z, min_severity, time.time()))
+    return cursor.lastrowid
+
+def set_enabled(subscription_id, enabled, conn=None):
+    """Enables or disables a subscription; returns whether it exists."""
+    with storage.transaction(conn) as c:
+        cursor = c.execute("UPDATE subscriptions SET enabled = ?, updated_at = ? WHERE id = ?",
+                           (1 if enabled else 0, time.time(), subscription_id))
+    return cursor.rowcount > 0
+
+def remove_subscription(subscription_id, conn=None):
+    """Deletes a subscription; returns whether it existed."""
+    with storage.transaction(conn) as c:
+        cursor = c.execute("DELETE FROM subscriptions WHERE id = ?", (subscription_id,))
+    return cursor.rowcount > 0
+
+def list_subscriptions(conn=None):
+    """Returns every subscription row as a dict, enabled or not."""
+    conn = conn or storage.get_connection()
+    cursor = conn.execute("""
+        SELECT id, name, destination, series_id, series_group, min_surprise_z, min_severity, enabled
+        FROM subscriptions ORDER BY id;
+    """)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+if __name__ == "__main__":
+    import notification_dispatcher
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+    parser = argparse.ArgumentParser(description="Manage notification subscriptions.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='route matching events to a webhook')
+    add.add_argument('destination', help='webhook URL')
+    selector = add.add_mutually_exclusive_group()
+    selector.add_argument('--series', dest='series_id', help='one series ID')
+    selector.add_argument('--group', dest='series_group', help='a series.json group, e.g. cpi')
+    add.add_argument('--min-surprise', dest='min_surprise_z', type=float, help='minimum |surprise z|')
+    add.add_argument('--min-severity', choices=list(SEVERITY_RANK))
+    add.add_argument('--name')
+    commands.add_parser('list', help='show subscriptions')
+    for command in ('remove', 'enable', 'disable'):
+        commands.add_parser(command).add_argument('id', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        subscription_id = add_subscription(args.destination, args.series_id, args.series_group,
+                                           args.min_surprise_z, args.min_severity, args.name)
+        logger.info("Added subscription %d", subscription_id)
+    elif args.command == 'list':
+        for row in list_subscriptions():
+            target = row['series_id'] or (f"group {row['series_group']}" if row['series_group'] else "all series")
+            conditions = []
+            if row['min_surprise_z'] is not None:
+                conditions.append(f"|z| >= {row['min_surprise_z']}")
+            if row['min_severity']:
+                conditions.append(f"severity >= {row['min_severity']}")
+            print(f"{row['id']:>4} {'on ' if row['enabled'] else 'off'} {row['name'] or '-':<20} "
+                  f"{notification_dispatcher.redact(row['destination'])} <- {target}"
+                  f"{' if ' + ' and '.join(conditions) if conditions else ''}")
+    elif args.command == 'remove':
+        if not remove_subscription(args.id):
+            logger.error("No subscription %d", args.id)
+    else:
+        if not set_enabled(args.id, args.command == 'enable'):
+            logger.error("No subscription %d", args.id)
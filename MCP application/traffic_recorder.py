@@ -0,0 +1,127 @@
+"""Recording of raw BLS API responses and release pages for offline replay.
+
+While a recording is active, the fetch functions in data_collector hand every
+response they receive to capture(): BLS API bodies (including those
+unchanged since the previous poll) and release pages (including 304s). Each
+response is appended as one JSON line to a gzip file, with the time it
+arrived, the request that produced it (series, years or URL; never the API
+key), the HTTP status and the raw body.
+
+The file is flushed after every record, so a recording cut short by a crash
+or Ctrl-C is still readable up to its last response. replay.py feeds a
+recording back through the pipeline.
+
+    python collector_cli.py daemon --record FILE.jsonl.gz
+"""
+import gzip
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BLS_API = 'bls_api'
+RELEASE_PAGE = 'release_page'
+
+_recorder = None
+
+class Record:
+    """One recorded response."""
+    __slots__ = ('t', 'kind', 'request', 'status', 'body')
+
+    def __init__(self, t, kind, request, status, body):
+        self.t = t
+        self.kind = kind
+        self.request = request
+        self.status = status
+        self.body = body
+
+    def __repr__(self):
+        return f"Record({self.kind} {self.status} at {self.t:.3f}, {len(self.body)} bytes)"
+
+class Recorder:
+    """Appends responses to a gzip-compressed JSON-lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, kind, request, status, body, t=None):
+        line = json.dumps({
+            't': time.time() if t is None else t,
+            'kind': kind,
+            'request': request,
+            'status': status,
+            'body': body.decode('utf-8', errors='replace') if isinstance(body, (bytes, bytearray)) else body,
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def start(path):
+    """Starts recording every captured response to `path` (appending if it exists)."""
+    global _recorder
+    stop()
+    _recorder = Recorder(path)
+    logger.info("Recording BLS responses to %s", path)
+    return _recorder
+
+def stop():
+    """Stops and closes the active recording, if any."""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        logger.info("Recorded %d response(s) to %s", _recorder.count, _recorder.path)
+        _recorder = None
+
+def is_active():
+    return _recorder is not None
+
+def capture(kind, request, status, body):
+    """Records one response if a recording is active; never raises into the fetch path."""
+    recorder = _recorder
+    if recorder is None:
+        return
+    try:
+        recorder.write(kind, request, status, body)
+    except (OSError, ValueError) as e:
+        logger.error("Could not record %s response: %s", kind, e)
+
+def tee(kind, request, status, chunks):
+    """Passes a streamed body through, recording it once it has been read in full."""
+    arrived = time.time()
+    parts = []
+    for chunk in chunks:
+        parts.append(bytes(chunk))
+        yield chunk
+    recorder = _recorder
+    if recorder is not None:
+        try:
+            recorder.write(kind, request, status, b''.join(parts), t=arrived)
+        except (OSError, ValueError) as e:
+            logger.error("Could not record %s response: %s", kind, e)
+
+def read(path):
+    """Yields the Records of a recording in order, stopping quietly at a truncated tail."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    logger.warning("Stopping at a malformed record in %s", path)
+                    return
+                yield Record(item['t'], item['kind'], item.get('request'), item.get('status'), item.get('body') or '')
+        except EOFError:
+            # The recording process died mid-write; everything before was flushed whole
+            logger.warning("Recording %s ends in a truncated record", path)